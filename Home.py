@@ -6,6 +6,7 @@ from pathlib import Path
 from PIL import Image
 import json
 from pages.css import load_css
+from activity_log import log_activity_event
 
 # =================================
 # Page configuration
@@ -245,7 +246,7 @@ if st.session_state.auth_view == "login":
                 "access": access
             }
 
-            supabase.table("user_activity_log").insert({
+            log_activity_event(supabase, {
 
                 "user_id": user_id,
                 "user_name": profile_data.get("full_name"),
@@ -255,7 +256,7 @@ if st.session_state.auth_view == "login":
                 "action": "Login",
                 "page": "Home"
 
-            }).execute()
+            })
 
             if "beta" in access:
                 st.switch_page("pages/dashboard_beta.py")
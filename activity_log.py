@@ -0,0 +1,152 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+# =================================
+# ACTIVITY LOG CONFIG
+# =================================
+# Navigation and login events are queued here and written by a daemon
+# thread in multi-row inserts, so click handlers never wait on Supabase.
+ACTIVITY_TABLE = "user_activity_log"
+FLUSH_INTERVAL = 5
+FLUSH_BATCH = 50
+MAX_BUFFER = 2000
+
+# Postgres / PostgREST error codes worth retrying: connection, resources,
+# timeouts and PostgREST losing the database. Errors without a code
+# (network failures, 5xx pages without a JSON body) are retried too;
+# anything else (constraints, schema, bad payload) never succeeds.
+TRANSIENT_CODE_PREFIXES = (
+    "08", "53", "57", "58",
+    "PGRST000", "PGRST001", "PGRST002", "PGRST003",
+)
+
+logger = logging.getLogger(__name__)
+
+# bounded: during an outage the oldest events are dropped, the UI never blocks
+_buffer = deque(maxlen=MAX_BUFFER)
+_buffer_cond = threading.Condition()
+_flush_lock = threading.Lock()
+_flusher = None
+
+# =================================
+# ENQUEUE
+# =================================
+def log_activity_event(supabase, row):
+
+    with _buffer_cond:
+        _buffer.append((supabase, row))
+        _ensure_flusher()
+
+        if len(_buffer) >= FLUSH_BATCH:
+            _buffer_cond.notify()
+
+
+def _ensure_flusher():
+
+    global _flusher
+
+    if _flusher is None or not _flusher.is_alive():
+        _flusher = threading.Thread(
+            target=_run_flusher,
+            name="activity-log-flusher",
+            daemon=True
+        )
+        _flusher.start()
+
+# =================================
+# FLUSH
+# =================================
+def _is_transient(error):
+
+    code = str(getattr(error, "code", None) or "")
+
+    return not code or code.startswith(TRANSIENT_CODE_PREFIXES)
+
+
+# a permanent error fails the whole chunk: insert row by row and drop
+# only the rows that still fail for good
+def _insert_rows(supabase, rows):
+
+    failed = []
+
+    for row in rows:
+
+        try:
+            supabase.table(ACTIVITY_TABLE).insert(row).execute()
+
+        except Exception as e:
+
+            if _is_transient(e):
+                failed.append(row)
+            else:
+                logger.error("Activity log row dropped: %s (%s)", e, row)
+
+    return failed
+
+
+def flush_activity():
+
+    with _flush_lock:
+
+        with _buffer_cond:
+            pending = list(_buffer)
+            _buffer.clear()
+
+        if not pending:
+            return True
+
+        # rows are grouped per client (service key vs. logged-in session)
+        batches = {}
+
+        for supabase, row in pending:
+            batches.setdefault(id(supabase), (supabase, []))[1].append(row)
+
+        failed = []
+
+        for supabase, rows in batches.values():
+            for start in range(0, len(rows), FLUSH_BATCH):
+
+                chunk = rows[start:start + FLUSH_BATCH]
+
+                try:
+                    supabase.table(ACTIVITY_TABLE).insert(chunk).execute()
+
+                except Exception as e:
+
+                    if _is_transient(e):
+                        logger.warning("Activity log flush failed: %s", e)
+                        retry = chunk
+                    else:
+                        retry = _insert_rows(supabase, chunk)
+
+                    failed.extend((supabase, row) for row in retry)
+
+        # back in front of newer events; past the bound the oldest go first
+        if failed:
+            with _buffer_cond:
+                pending = failed + list(_buffer)
+                _buffer.clear()
+                _buffer.extend(pending[-MAX_BUFFER:])
+
+        return not failed
+
+
+def _run_flusher():
+
+    while True:
+
+        with _buffer_cond:
+            _buffer_cond.wait_for(
+                lambda: len(_buffer) >= FLUSH_BATCH,
+                timeout=FLUSH_INTERVAL
+            )
+
+        # Supabase down: back off instead of retrying a full buffer in a loop
+        if not flush_activity():
+            time.sleep(FLUSH_INTERVAL)
+
+
+atexit.register(flush_activity)
@@ -0,0 +1,185 @@
+import atexit
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+from datetime import datetime, timezone
+from email.message import EmailMessage
+
+# =================================
+# EMAIL QUEUE CONFIG
+# =================================
+# Outbound mail is sent by worker threads so approve/reject handlers can
+# rerun right away. Messages use the Resend payload shape
+# ({"from", "to", "cc", "subject", "html"}) whatever the transport is.
+EMAIL_WORKERS = 2
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 2
+EXIT_TIMEOUT = 15
+
+# created by sql/email_log.sql
+EMAIL_LOG_TABLE = "email_log"
+
+_queue = queue.Queue()
+_workers = []
+_workers_lock = threading.Lock()
+
+# =================================
+# TRANSPORTS
+# =================================
+# A transport is any callable taking the message dict. Pick one with
+# EMAIL_TRANSPORT=resend|smtp|file or set_transport() in tests.
+def resend_transport(message):
+
+    import resend  # type: ignore
+
+    resend.Emails.send(message)
+
+
+def smtp_transport(message):
+
+    email = EmailMessage()
+    email["From"] = message["from"]
+    email["To"] = ", ".join(message.get("to", []))
+
+    if message.get("cc"):
+        email["Cc"] = ", ".join(message["cc"])
+
+    email["Subject"] = message.get("subject", "")
+    email.set_content(message.get("html", ""), subtype="html")
+
+    with smtplib.SMTP(
+        os.getenv("EMAIL_SMTP_HOST", "localhost"),
+        int(os.getenv("EMAIL_SMTP_PORT", "1025"))
+    ) as server:
+        server.send_message(email)
+
+
+def file_transport(message):
+
+    path = os.getenv("EMAIL_FILE_SINK", "outbox.jsonl")
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(message, ensure_ascii=False) + "\n")
+
+
+TRANSPORTS = {
+    "resend": resend_transport,
+    "smtp": smtp_transport,
+    "file": file_transport,
+}
+
+_transport = TRANSPORTS.get(
+    os.getenv("EMAIL_TRANSPORT", "resend"),
+    resend_transport
+)
+
+
+def set_transport(transport):
+
+    global _transport
+
+    _transport = TRANSPORTS.get(transport, transport)
+
+# =================================
+# ENQUEUE
+# =================================
+def enqueue_email(message, supabase=None, referencia=None):
+
+    _ensure_workers()
+
+    _queue.put({
+        "message": message,
+        "supabase": supabase,
+        "referencia": referencia,
+    })
+
+
+def _ensure_workers():
+
+    with _workers_lock:
+
+        _workers[:] = [w for w in _workers if w.is_alive()]
+
+        while len(_workers) < EMAIL_WORKERS:
+
+            worker = threading.Thread(
+                target=_run_worker,
+                name=f"email-worker-{len(_workers)}",
+                daemon=True
+            )
+            worker.start()
+            _workers.append(worker)
+
+# =================================
+# DELIVERY
+# =================================
+def _deliver(job):
+
+    error = None
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+
+        try:
+            _transport(job["message"])
+            return "Enviado", attempt, None
+
+        except Exception as e:
+            error = str(e)
+            print(f"Email {job['referencia']} attempt {attempt} failed: {e}")
+
+        if attempt < MAX_ATTEMPTS:
+            time.sleep(BACKOFF_BASE ** attempt)
+
+    return "Fallido", MAX_ATTEMPTS, error
+
+
+def _record_status(job, estatus, intentos, error):
+
+    supabase = job["supabase"]
+
+    if supabase is None:
+        return
+
+    message = job["message"]
+
+    try:
+        supabase.table(EMAIL_LOG_TABLE).insert({
+            "referencia": job["referencia"],
+            "asunto": message.get("subject"),
+            "destinatarios": message.get("to", []),
+            "estatus": estatus,
+            "intentos": intentos,
+            "error": error,
+            "fecha": datetime.now(timezone.utc).isoformat(),
+        }).execute()
+
+    except Exception as e:
+        print(f"Email status for {job['referencia']} not recorded: {e}")
+
+
+def _run_worker():
+
+    while True:
+
+        job = _queue.get()
+
+        try:
+            estatus, intentos, error = _deliver(job)
+            _record_status(job, estatus, intentos, error)
+
+        finally:
+            _queue.task_done()
+
+
+def _drain_on_exit():
+
+    deadline = time.monotonic() + EXIT_TIMEOUT
+
+    while _queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+
+atexit.register(_drain_on_exit)
@@ -0,0 +1,119 @@
+import threading
+
+# =================================
+# FOLIO ALLOCATOR CONFIG
+# =================================
+# New pases get their folio and are inserted in one call to the
+# insert_pase_with_folio RPC (sql/folio_allocator.sql). Until that
+# function is deployed, every capture re-reads the highest stored folio
+# (so other processes and replicas are seen) and retries on 23505. The
+# lock only covers picking the number; _reserved keeps two threads of
+# this process from picking the same one while their inserts run.
+FOLIO_RPC = "insert_pase_with_folio"
+FOLIO_DIGITS = 5
+MAX_LOCAL_RETRIES = 3
+
+_rpc_available = True
+
+_reserved = {}
+_reserved_lock = threading.Lock()
+
+
+def format_folio(prefix, number):
+
+    return f"{prefix}{str(number).zfill(FOLIO_DIGITS)}"
+
+# =================================
+# SERVER SIDE (RPC)
+# =================================
+def _insert_rpc(supabase, table_name, prefix, payload):
+
+    response = supabase.rpc(FOLIO_RPC, {
+        "p_table": table_name,
+        "p_prefix": prefix,
+        "p_payload": payload,
+    }).execute()
+
+    return response.data
+
+# =================================
+# LOCAL STAND-IN
+# =================================
+def _max_folio(supabase, table_name, prefix):
+
+    response = (
+        supabase.table(table_name)
+        .select('"No. de Folio"')
+        .ilike('"No. de Folio"', f"{prefix}%")
+        .order('"No. de Folio"', desc=True)
+        .limit(1)
+        .execute()
+    )
+
+    last = response.data
+
+    if not last:
+        return 0
+
+    return int(last[0]["No. de Folio"].replace(prefix, ""))
+
+
+def _next_number(supabase, table_name, prefix):
+
+    stored = _max_folio(supabase, table_name, prefix)
+
+    with _reserved_lock:
+        number = max(stored, _reserved.get(prefix, 0)) + 1
+        _reserved[prefix] = number
+
+    return number
+
+
+def _insert_local(supabase, table_name, prefix, payload):
+
+    for attempt in range(MAX_LOCAL_RETRIES):
+
+        number = _next_number(supabase, table_name, prefix)
+        folio = format_folio(prefix, number)
+
+        try:
+            supabase.table(table_name).insert({
+                **payload,
+                "No. de Folio": folio,
+            }).execute()
+
+            return folio
+
+        except Exception as e:
+
+            # give the number back unless a later capture already moved on
+            with _reserved_lock:
+                if _reserved.get(prefix) == number:
+                    _reserved[prefix] = number - 1
+
+            # 23505: another process took the folio, re-read and retry
+            if getattr(e, "code", None) != "23505" or attempt == MAX_LOCAL_RETRIES - 1:
+                raise
+
+# =================================
+# INSERT WITH FOLIO
+# =================================
+def insert_with_folio(supabase, table_name, prefix, payload):
+
+    global _rpc_available
+
+    if _rpc_available:
+
+        try:
+            return _insert_rpc(supabase, table_name, prefix, payload)
+
+        except Exception as e:
+
+            # PGRST202: function not found, fall back for this process
+            if getattr(e, "code", None) != "PGRST202":
+                raise
+
+            print(f"{FOLIO_RPC} not deployed, using local folio counter")
+            _rpc_available = False
+
+    return _insert_local(supabase, table_name, prefix, payload)
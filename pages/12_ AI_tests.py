@@ -1,6 +1,7 @@
 import streamlit as st
 from auth import require_login, require_access
 from pages.css import load_css
+from activity_log import log_activity_event
 from supabase import create_client
 
 # =================================
@@ -57,20 +58,15 @@ supabase = get_supabase()
 
 def log_activity(action, page):
 
-    try:
+    log_activity_event(supabase, {
 
-        supabase.table("user_activity_log").insert({
+        "user_id": user.get("id"),
+        "user_name": user.get("name"),
+        "login_counter": st.session_state.get("login_counter"),
+        "action": action,
+        "page": page,
 
-            "user_id": user.get("id"),
-            "user_name": user.get("name"),
-            "login_counter": st.session_state.get("login_counter"),
-            "action": action,
-            "page": page,
-
-        }).execute()
-
-    except Exception as e:
-        print(e)
+    })
         
 # =================================
 # Navigation
@@ -5,6 +5,8 @@ import pandas as pd
 from supabase import create_client
 from auth import require_login, require_access
 from pages.css import load_css
+from activity_log import log_activity_event
+from supabase_loader import FULL_ROW
 
 # =================================
 # RELEASE CHANNEL
@@ -64,20 +66,15 @@ supabase = get_supabase()
 # =================================
 def log_activity(action, page):
 
-    try:
+    log_activity_event(supabase, {
 
-        supabase.table("user_activity_log").insert({
+        "user_id": user.get("id"),
+        "user_name": user.get("name"),
+        "login_counter": st.session_state.get("login_counter"),
+        "action": action,
+        "page": page,
 
-            "user_id": user.get("id"),
-            "user_name": user.get("name"),
-            "login_counter": st.session_state.get("login_counter"),
-            "action": action,
-            "page": page,
-
-        }).execute()
-
-    except Exception as e:
-        print(e)
+    })
 
 # =================================
 # Navigation
@@ -100,10 +97,11 @@ st.title("💰 Consulta y Reportes Bono de Operadores")
 
 try:
 
+    # the Excel export hands over the whole record
     response = (
         supabase
         .table("bonos_operadores")
-        .select("*")
+        .select(FULL_ROW)
         .order("fecha_registro", desc=True)
         .execute()
     )
@@ -4,6 +4,9 @@ from auth import require_login, require_access
 import streamlit.components.v1 as components
 from supabase import create_client
 from pages.css import load_css
+from activity_log import log_activity_event
+from supabase_loader import fetch_rows
+from table_cache import cached_tables
 import math
 
 # =================================
@@ -70,20 +73,15 @@ user = st.session_state.user
 # =================================
 def log_activity(action, page):
 
-    try:
-
-        supabase.table("user_activity_log").insert({
+    log_activity_event(supabase, {
 
-            "user_id": user.get("id"),
-            "user_name": user.get("name"),
-            "login_counter": st.session_state.get("login_counter"),
-            "action": action,
-            "page": page,
+        "user_id": user.get("id"),
+        "user_name": user.get("name"),
+        "login_counter": st.session_state.get("login_counter"),
+        "action": action,
+        "page": page,
 
-        }).execute()
-
-    except Exception as e:
-        print(e)
+    })
 
 # =================================
 # HARD RESET ON PAGE LOAD
@@ -132,35 +130,33 @@ EMPRESA_CONFIG = {
 }
 
 # =================================
-# LOADERS
+# HARD LOCK 2025+ (pushed to Supabase)
 # =================================
-@st.cache_data(ttl=600)
-def cargar_tabla(nombre_tabla):
-    try:
-        all_data = []
-        chunk_size = 1000
-        offset = 0
-
-        while True:
-            response = (
-                supabase
-                .table(nombre_tabla)
-                .select("*")
-                .range(offset, offset + chunk_size - 1)
-                .execute()
-            )
-
-            data = response.data
-
-            if not data:
-                break
+LOCK_DATE = pd.Timestamp("2025-01-01")
 
-            all_data.extend(data)
+LOCK_COLUMNS = {
+    "ordenes": "fecha_registro",
+    "partes": "fecha_compra",
+    "ostes": "fecha_oste"
+}
 
-            if len(data) < chunk_size:
-                break
+def filtros_lock(tipo):
+    return (
+        ("gte", LOCK_COLUMNS[tipo], LOCK_DATE.strftime("%Y-%m-%d")),
+    )
 
-            offset += chunk_size
+# =================================
+# LOADERS
+# =================================
+# filtros: (method, column, value) predicates applied by PostgREST
+@cached_tables(ttl=600)
+def cargar_tabla(nombre_tabla, filtros=()):
+    try:
+        all_data = fetch_rows(
+            supabase,
+            nombre_tabla,
+            filters=list(filtros)
+        )
 
         if not all_data:
             return pd.DataFrame()
@@ -280,9 +276,9 @@ empresa = st.radio(
 
 config = EMPRESA_CONFIG[empresa]
 
-df = cargar_tabla(config["ordenes"])
-df_partes = cargar_tabla(config["partes"])
-df_ostes = cargar_tabla(config["ostes"])
+df = cargar_tabla(config["ordenes"], filtros_lock("ordenes"))
+df_partes = cargar_tabla(config["partes"], filtros_lock("partes"))
+df_ostes = cargar_tabla(config["ostes"], filtros_lock("ostes"))
 
 # =============================
 # NORMALIZACIÓN
@@ -336,8 +332,7 @@ if "Fecha Analisis" in df_partes.columns:
 # =================================
 # HARD LOCK 2025+ FOR INTERNA & EXTERNA
 # =================================
-LOCK_DATE = pd.Timestamp("2025-01-01")
-
+# already applied server-side, kept for rows with unparseable dates
 if "Fecha Registro" in df.columns:
     df = df[df["Fecha Registro"] >= LOCK_DATE]
 
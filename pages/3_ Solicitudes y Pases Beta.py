@@ -4,6 +4,9 @@ from supabase import create_client
 from datetime import datetime, date, timezone
 from auth import require_login, require_access
 from pages.css import load_css
+from activity_log import log_activity_event
+from table_cache import bump_version, cached_tables
+from folio_allocator import insert_with_folio
 import re
 
 # =================================
@@ -56,20 +59,15 @@ load_css()
 
 def log_activity(action, page):
 
-    try:
+    log_activity_event(supabase, {
 
-        supabase.table("user_activity_log").insert({
+        "user_id": user.get("id"),
+        "user_name": user.get("name"),
+        "login_counter": st.session_state.get("login_counter"),
+        "action": action,
+        "page": page,
 
-            "user_id": user.get("id"),
-            "user_name": user.get("name"),
-            "login_counter": st.session_state.get("login_counter"),
-            "action": action,
-            "page": page,
-
-        }).execute()
-
-    except Exception as e:
-        print(e)
+    })
 
 # =================================
 # Navigation
@@ -119,7 +117,7 @@ if has_pases:
 
         supabase = get_supabase()
 
-        @st.cache_data(ttl=3600)
+        @cached_tables("vehicle_units", ttl=3600)
         def cargar_unidades_supabase(empresa_codigo):
 
             response = (
@@ -214,29 +212,9 @@ if has_pases:
 
             prefix = prefix_map.get(data["Empresa"])
 
-            # ---- GET LAST FOLIO ----
-            response = (
-                supabase.table(table_name)
-                .select('"No. de Folio"')
-                .ilike('"No. de Folio"', f"{prefix}%")
-                .order('"No. de Folio"', desc=True)
-                .limit(1)
-                .execute()
-            )
-
-            last = response.data
-
-            if last:
-                num = int(last[0]["No. de Folio"].replace(prefix, ""))
-                next_num = num + 1
-            else:
-                next_num = 1
-
-            folio = f"{prefix}{str(next_num).zfill(5)}"
-
             # ---- INSERT INTO SUPABASE ----
             payload = data.copy()
-            payload["No. de Folio"] = folio
+            payload.pop("No. de Folio", None)
 
             payload = {
                 k: None if (pd.isna(v) or v == "")
@@ -245,8 +223,15 @@ if has_pases:
                 for k, v in payload.items()
             }
 
+            # ---- FOLIO + INSERT (one call) ----
             try:
-                response = supabase.table(table_name).insert(payload).execute()
+                folio = insert_with_folio(
+                    supabase,
+                    table_name,
+                    prefix,
+                    payload
+                )
+                bump_version(table_name)
                 return folio
 
             except Exception as e:
@@ -1284,6 +1269,8 @@ if has_bonos:
 
                         }).execute()
 
+                        bump_version("bonos_operadores")
+
                         log_activity(
                             "Nuevo formulario bono",
                             "Solicitudes y Pases"
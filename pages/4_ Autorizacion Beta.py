@@ -6,6 +6,13 @@ from io import BytesIO
 from auth import require_login, require_access
 from supabase import create_client
 from pages.css import load_css
+from activity_log import log_activity_event
+from email_queue import enqueue_email
+from user_directory import user_by_name
+from supabase_loader import sync_table, select_columns, grouped_counts, fetch_keyset_page, count_rows
+from concurrent.futures import ThreadPoolExecutor
+from table_cache import bump_version, invalidate_tables, cached_tables, table_version
+from search_index import build_search_index, search_substring, search_exact
 import html
 import resend  #type: ignore
 
@@ -155,20 +162,20 @@ if has_autorizacion:
             "setfreight": "SET FREIGHT INTERNATIONAL",
         }
 
+        EMPRESA_TABLE_MAP = {
+            "IGLOO TRANSPORT": "IGLOO",
+            "LINCOLN FREIGHT": "LINCOLN",
+            "PICUS": "PICUS",
+            "SET FREIGHT INTERNATIONAL": "SFI",
+            "SET LOGIS PLUS": "SLP",
+        }
+
         def actualizar_estado_pase(empresa, folio, nuevo_estado):
 
             if nuevo_estado not in VALID_ESTADOS:
                 return
 
-            table_map = {
-                "IGLOO TRANSPORT": "IGLOO",
-                "LINCOLN FREIGHT": "LINCOLN",
-                "PICUS": "PICUS",
-                "SET FREIGHT INTERNATIONAL": "SFI",
-                "SET LOGIS PLUS": "SLP",
-            }
-
-            table_name = table_map.get(empresa)
+            table_name = EMPRESA_TABLE_MAP.get(empresa)
             if not table_name:
                 return
 
@@ -179,122 +186,83 @@ if has_autorizacion:
                 .eq('"No. de Folio"', folio)\
                 .execute()
 
-        # =================================
-        # Update OSTE (SUPABASE)
-        # =================================
-        def actualizar_oste_pase(empresa, folio, oste):
-
-            table_map = {
-                "IGLOO TRANSPORT": "IGLOO",
-                "LINCOLN FREIGHT": "LINCOLN",
-                "PICUS": "PICUS",
-                "SET FREIGHT INTERNATIONAL": "SFI",
-                "SET LOGIS PLUS": "SLP",
-            }
-
-            table_name = table_map.get(empresa)
-
-            if not table_name:
-                return
-
-            supabase = get_supabase_client()
-
-            supabase.table(table_name)\
-                .update({"Oste": oste})\
-                .eq('"No. de Folio"', folio)\
-                .execute()
+            bump_version(table_name)
 
         # =================================
-        # Update No. de Orden (SUPABASE)
+        # GUARDAR FACTURA
         # =================================
+        def guardar_factura(folio, numero_factura):
 
-        def actualizar_no_reporte_pase(empresa, folio, nuevo_no_reporte):
-
-            table_map = {
-                "IGLOO TRANSPORT": "IGLOO",
-                "LINCOLN FREIGHT": "LINCOLN",
-                "PICUS": "PICUS",
-                "SET FREIGHT INTERNATIONAL": "SFI",
-                "SET LOGIS PLUS": "SLP",
-            }
+            guardar_facturas({folio: numero_factura})
 
-            table_name = table_map.get(empresa)
+        # one upsert on "No. de Folio" for any number of folios; needs the
+        # unique constraint from sql/invoices_folio_unique.sql
+        def guardar_facturas(facturas):
 
-            if not table_name:
+            if not facturas:
                 return
 
             supabase = get_supabase_client()
 
-            valor_final = str(nuevo_no_reporte).strip()
+            try:
+                supabase.table("INVOICES")\
+                    .upsert(
+                        [
+                            {
+                                "No. de Folio": folio,
+                                "No. de Factura": numero_factura
+                            }
+                            for folio, numero_factura in facturas.items()
+                        ],
+                        on_conflict='"No. de Folio"'
+                    )\
+                    .execute()
 
-            if valor_final == "":
-                valor_final = None
+            except Exception as e:
 
-            supabase.table(table_name)\
-                .update({
-                    "No. de Reporte": valor_final
-                })\
-                .eq('"No. de Folio"', folio)\
-                .execute()
-            
-        # =================================
-        # Update Descripcion Problema
-        # =================================
-        def actualizar_descripcion_pase(empresa, folio, nueva_descripcion):
-
-            table_map = {
-                "IGLOO TRANSPORT": "IGLOO",
-                "LINCOLN FREIGHT": "LINCOLN",
-                "PICUS": "PICUS",
-                "SET FREIGHT INTERNATIONAL": "SFI",
-                "SET LOGIS PLUS": "SLP",
-            }
+                # 42P10: constraint not there yet, update/insert instead
+                if getattr(e, "code", None) != "42P10":
+                    raise
 
-            table_name = table_map.get(empresa)
-            if not table_name:
-                return
+                guardar_facturas_sin_constraint(supabase, facturas)
 
-            supabase = get_supabase_client()
+            bump_version("INVOICES")
 
-            supabase.table(table_name)\
-                .update({"Descripcion Problema": nueva_descripcion})\
-                .eq('"No. de Folio"', folio)\
-                .execute()
 
-        # =================================
-        # GUARDAR FACTURA
-        # =================================
-        def guardar_factura(folio, numero_factura):
-
-            supabase = get_supabase_client()
+        def guardar_facturas_sin_constraint(supabase, facturas):
 
             response = (
                 supabase
                 .table("INVOICES")
-                .select("*")
-                .eq('"No. de Folio"', folio)
+                .select('"No. de Folio"')
+                .in_('"No. de Folio"', list(facturas))
                 .execute()
             )
 
-            data = response.data
+            existentes = {row["No. de Folio"] for row in response.data or []}
 
-            if data:
+            for folio in existentes:
                 supabase.table("INVOICES")\
-                    .update({"No. de Factura": numero_factura})\
+                    .update({"No. de Factura": facturas[folio]})\
                     .eq('"No. de Folio"', folio)\
                     .execute()
-            else:
-                supabase.table("INVOICES")\
-                    .insert({
-                        "No. de Folio": folio,
-                        "No. de Factura": numero_factura
-                    })\
-                    .execute()
+
+            nuevas = [
+                {
+                    "No. de Folio": folio,
+                    "No. de Factura": numero_factura
+                }
+                for folio, numero_factura in facturas.items()
+                if folio not in existentes
+            ]
+
+            if nuevas:
+                supabase.table("INVOICES").insert(nuevas).execute()
 
         # =================================
         # Registrar Cambio en CHANGELOG
         # =================================
-        def registrar_cambio_log(
+        def fila_cambio_log(
             usuario,
             empresa,
             folio,
@@ -306,9 +274,7 @@ if has_autorizacion:
             comentario=""
         ):
 
-            supabase = get_supabase_client()
-
-            response = supabase.table("AUDIT").insert({
+            return {
                 "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 "Usuario": clean(usuario),
                 "Empresa": clean(empresa),
@@ -319,11 +285,93 @@ if has_autorizacion:
                 "OSTE Anterior": clean(oste_anterior),
                 "OSTE Nuevo": clean(oste_nuevo),
                 "Comentario": clean(comentario)
-            }).execute()
+            }
+
+        def registrar_cambios_log(filas):
+
+            if not filas:
+                return
+
+            supabase = get_supabase_client()
+
+            response = supabase.table("AUDIT").insert(filas).execute()
+
+            bump_version("AUDIT")
 
             if getattr(response, "error", None):
                 st.error(f"Audit log error: {response.error}")
 
+        def registrar_cambio_log(
+            usuario,
+            empresa,
+            folio,
+            tipo_cambio,
+            estado_anterior=None,
+            estado_nuevo=None,
+            oste_anterior=None,
+            oste_nuevo=None,
+            comentario=""
+        ):
+
+            registrar_cambios_log([
+                fila_cambio_log(
+                    usuario,
+                    empresa,
+                    folio,
+                    tipo_cambio,
+                    estado_anterior,
+                    estado_nuevo,
+                    oste_anterior,
+                    oste_nuevo,
+                    comentario
+                )
+            ])
+
+        # =================================
+        # CHANGE-SET (one PATCH per folio)
+        # =================================
+        # Collects the edited fields of one folio plus their audit rows;
+        # aplicar_cambios sends one update and one AUDIT insert.
+        def nuevo_cambio(empresa, folio, usuario):
+
+            return {
+                "empresa": empresa,
+                "folio": folio,
+                "usuario": usuario,
+                "campos": {},
+                "logs": [],
+            }
+
+        def agregar_cambio(cambio, campos, **log):
+
+            cambio["campos"].update(campos)
+
+            cambio["logs"].append(
+                fila_cambio_log(
+                    usuario=cambio["usuario"],
+                    empresa=cambio["empresa"],
+                    folio=cambio["folio"],
+                    **log
+                )
+            )
+
+        def aplicar_cambios(cambio):
+
+            table_name = EMPRESA_TABLE_MAP.get(cambio["empresa"])
+
+            if cambio["campos"] and table_name:
+
+                supabase = get_supabase_client()
+
+                supabase.table(table_name)\
+                    .update(cambio["campos"])\
+                    .eq('"No. de Folio"', cambio["folio"])\
+                    .execute()
+
+                bump_version(table_name)
+
+            registrar_cambios_log(cambio["logs"])
+
         # =================================
         # Log estado sin refacciones
         # =================================
@@ -353,6 +401,8 @@ if has_autorizacion:
 
             supabase.table("SERVICES").insert(payload).execute()
 
+            bump_version("SERVICES")
+
         # =================================
         # Load Servicios for Folio (SUPABASE)
         # =================================
@@ -391,12 +441,14 @@ if has_autorizacion:
         # =================================
         # UPSERT Servicios / Refacciones (SUPABASE)
         # =================================
+        SERVICES_BATCH_SIZE = 500
+
         def guardar_servicios_refacciones(folio, usuario, servicios_df, nuevo_estado=None):
 
             supabase = get_supabase_client()
 
             if servicios_df is None or servicios_df.empty:
-                return
+                return []
 
             fecha_mod = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -408,32 +460,60 @@ if has_autorizacion:
 
             fecha_col = estado_fecha_map.get(nuevo_estado)
 
-            for _, r in servicios_df.iterrows():
+            # ---- BUILD PAYLOADS (one pass) ----
+            lineas = servicios_df.reset_index(drop=True)
 
-                cantidad = r.get("Cantidad", 0)
+            payload_df = (
+                lineas
+                .reindex(columns=["Parte", "Tipo De Parte", "Posicion"], fill_value="")
+                .fillna("")
+                .astype(str)
+                .apply(lambda col: col.str.strip())
+            )
 
-                if pd.isna(cantidad) or cantidad == "":
-                    cantidad = 0
+            cantidad = lineas.get("Cantidad", pd.Series(0, index=lineas.index))
 
-                payload = {
-                    "No. de Folio": folio,
-                    "Modifico": usuario,
-                    "Parte": str(r.get("Parte", "")).strip(),
-                    "Tipo De Parte": str(r.get("Tipo De Parte", "")).strip(),
-                    "Posicion": str(r.get("Posicion", "")).strip(),
-                    "Cantidad": int(float(cantidad)),
-                    "Fecha Mod": fecha_mod,
-                }
+            payload_df["Cantidad"] = (
+                cantidad
+                .replace("", 0)
+                .fillna(0)
+                .astype(float)
+                .astype(int)
+            )
+
+            payload_df.insert(0, "Modifico", usuario)
+            payload_df.insert(0, "No. de Folio", folio)
+            payload_df["Fecha Mod"] = fecha_mod
+
+            if fecha_col:
+                payload_df[fecha_col] = fecha_mod
 
-                if fecha_col:
-                    payload[fecha_col] = fecha_mod
+            payloads = payload_df.to_dict(orient="records")
 
-                supabase.table("SERVICES").insert(payload).execute()
+            # ---- BULK INSERT (chunked) ----
+            fallidas = []
+
+            for inicio in range(0, len(payloads), SERVICES_BATCH_SIZE):
+
+                lote = payloads[inicio:inicio + SERVICES_BATCH_SIZE]
+
+                try:
+                    supabase.table("SERVICES").insert(lote).execute()
+
+                except Exception as e:
+                    fallidas.append((
+                        list(range(inicio + 1, inicio + len(lote) + 1)),
+                        str(e)
+                    ))
+
+            bump_version("SERVICES")
+
+            return fallidas
 
         # =================================
         # Load Pase de Taller (SUPABASE)
         # =================================
-        @st.cache_data(ttl=300)
+        @cached_tables(*ACCESS_TABLE_MAP.values(), ttl=300)
         def cargar_pases_taller(user_access):
 
             supabase = get_supabase_client()
@@ -451,7 +531,7 @@ if has_autorizacion:
                 response = (
                     supabase
                     .table(tabla)
-                    .select("*")
+                    .select(select_columns("pases_taller"))
                     .execute()
                 )
 
@@ -465,6 +545,10 @@ if has_autorizacion:
 
             df = pd.concat(dfs, ignore_index=True)
 
+            return normalizar_pases(df)
+
+        def normalizar_pases(df):
+
             df.rename(columns={
                 "No. de Folio": "NoFolio",
                 "Fecha de Captura": "Fecha",
@@ -476,10 +560,104 @@ if has_autorizacion:
 
             return df
 
+        # =================================
+        # Pases grid page (keyset, SUPABASE)
+        # =================================
+        # Only the requested page is read: each permitted table returns at
+        # most CARDS_PER_PAGE + 1 rows after the cursor and the merge keeps
+        # the first ones, so page 1 costs the same at any table size.
+        CARDS_PER_PAGE = 10
+
+        def tablas_permitidas(user_access):
+
+            return [
+                tabla
+                for permiso, tabla in ACCESS_TABLE_MAP.items()
+                if permiso in user_access
+            ]
+
+        @cached_tables(*ACCESS_TABLE_MAP.values(), ttl=300)
+        def cargar_pagina_pases(user_access, estados, cursor=None):
+
+            supabase = get_supabase_client()
+
+            filtros = [("in_", "Estado", list(estados))]
+
+            def leer(tabla):
+                return fetch_keyset_page(
+                    supabase,
+                    tabla,
+                    "Fecha de Captura",
+                    "No. de Folio",
+                    cursor=cursor,
+                    columns=select_columns("pases_taller"),
+                    page_size=CARDS_PER_PAGE + 1,
+                    filters=filtros
+                )
+
+            tablas = tablas_permitidas(user_access)
+
+            with ThreadPoolExecutor(max_workers=max(1, len(tablas))) as executor:
+                filas = [
+                    fila
+                    for data in executor.map(leer, tablas)
+                    for fila in data
+                ]
+
+            if not filas:
+                return pd.DataFrame(), None
+
+            df = pd.DataFrame(filas)
+
+            df["_orden"] = pd.to_datetime(
+                df["Fecha de Captura"],
+                errors="coerce",
+                utc=True
+            )
+
+            df = df.sort_values(
+                ["_orden", "No. de Folio"],
+                ascending=False,
+                na_position="last",
+                kind="stable"
+            )
+
+            siguiente = None
+
+            if len(df) > CARDS_PER_PAGE:
+
+                df = df.head(CARDS_PER_PAGE)
+                ultima = df.iloc[-1]
+
+                siguiente = (
+                    None
+                    if pd.isna(ultima["Fecha de Captura"])
+                    else ultima["Fecha de Captura"],
+                    ultima["No. de Folio"]
+                )
+
+            df = df.drop(columns="_orden").reset_index(drop=True)
+
+            return normalizar_pases(df), siguiente
+
+        @cached_tables(*ACCESS_TABLE_MAP.values(), ttl=300)
+        def contar_pases(user_access, estados):
+
+            supabase = get_supabase_client()
+
+            return sum(
+                count_rows(
+                    supabase,
+                    tabla,
+                    filters=[("in_", "Estado", list(estados))]
+                )
+                for tabla in tablas_permitidas(user_access)
+            )
+
         # =================================
         # Load FACTURAS (SUPABASE)
         # =================================
-        @st.cache_data(ttl=300)
+        @cached_tables("INVOICES", ttl=300)
         def cargar_facturas():
 
             supabase = get_supabase_client()
@@ -487,7 +665,7 @@ if has_autorizacion:
             response = (
                 supabase
                 .table("INVOICES")
-                .select("*")
+                .select(select_columns("facturas"))
                 .execute()
             )
 
@@ -516,38 +694,16 @@ if has_autorizacion:
         # =================================
         # LOAD SERVICES
         # =================================
-        @st.cache_data(ttl=300)
+        @cached_tables("SERVICES", ttl=300)
         def cargar_services():
 
             supabase = get_supabase_client()
 
-            page_size = 1000
-            start = 0
-            all_rows = []
-
-            while True:
+            df = sync_table(supabase, "SERVICES", watermark="id")
 
-                response = (
-                    supabase
-                    .table("SERVICES")
-                    .select("*")
-                    .range(start, start + page_size - 1)
-                    .execute()
-                )
-
-                data = response.data
-
-                if not data:
-                    break
-
-                all_rows.extend(data)
-                start += page_size
-
-            if not all_rows:
+            if df.empty:
                 return pd.DataFrame()
 
-            df = pd.DataFrame(all_rows)
-
             df.columns = df.columns.str.strip()
 
             if "No. de Folio" in df.columns:
@@ -568,7 +724,7 @@ if has_autorizacion:
         # =================================
         # Load Audit Log
         # =================================
-        @st.cache_data(ttl=120)
+        @cached_tables("AUDIT", ttl=120)
         def cargar_audit():
 
             supabase = get_supabase_client()
@@ -595,19 +751,135 @@ if has_autorizacion:
             return df
 
         # =================================
-        # REFRESH CACHED DATA
+        # MASTER REPORT (REPORTES)
         # =================================
-        def refresh_cached_data():
-            cargar_pases_taller.clear()
-            cargar_facturas.clear()
-            cargar_audit.clear()
+        # pases + factura + aggregated parts, built once per data version;
+        # the REPORTES filters only mask this frame
+        def unir_valores(servicios, col):
+
+            valores = (
+                servicios.loc[servicios[col] != "", ["NoFolio", col]]
+                .drop_duplicates()
+                .sort_values(["NoFolio", col])
+            )
+
+            return valores.groupby("NoFolio")[col].agg(" | ".join)
+
+        @cached_tables(
+            *ACCESS_TABLE_MAP.values(),
+            "INVOICES",
+            "SERVICES",
+            ttl=300
+        )
+        def cargar_reporte_maestro(user_access):
+
+            resultados = cargar_pases_taller(user_access)
+
+            if resultados.empty:
+                return resultados
+
+            # ---------------------------------
+            # MERGE FACTURAS
+            # ---------------------------------
+            facturas = cargar_facturas()
+
+            if not facturas.empty:
+
+                resultados = resultados.merge(
+                    facturas
+                    .rename(columns={"No. de Folio": "NoFolio"})
+                    [["NoFolio", "No. de Factura"]],
+                    on="NoFolio",
+                    how="left",
+                )
+
+            # ---------------------------------
+            # MERGE SERVICES
+            # ---------------------------------
+            servicios = cargar_services()
+
+            if not servicios.empty:
+
+                servicios = servicios.reindex(
+                    columns=["NoFolio", "Parte", "Tipo De Parte"]
+                )
+
+                for col in ["Parte", "Tipo De Parte"]:
+                    servicios[col] = (
+                        servicios[col]
+                        .fillna("")
+                        .astype(str)
+                        .str.strip()
+                    )
+
+                servicios = servicios[
+                    (servicios["Parte"] != "")
+                    | (servicios["Tipo De Parte"] != "")
+                ]
+
+                folios = pd.Index(servicios["NoFolio"].unique(), name="NoFolio")
+
+                servicios_resumen = pd.DataFrame({
+                    "Partes": unir_valores(servicios, "Parte").reindex(folios, fill_value=""),
+                    "Tipos de Parte": unir_valores(servicios, "Tipo De Parte").reindex(folios, fill_value=""),
+                }).reset_index()
+
+                resultados = resultados.merge(
+                    servicios_resumen,
+                    on="NoFolio",
+                    how="left",
+                )
+
+            return resultados
 
         # =================================
-        # LOADERS
+        # BUSCAR INDEX
         # =================================
-        #cache
-        refresh_cached_data()
+        # pases + factura and their search index, rebuilt when a pase table
+        # or INVOICES is written; cache_resource hands back the same object
+        # so the index is never copied on a keystroke rerun
+        @st.cache_resource(ttl=300, max_entries=8)
+        def cargar_indice_busqueda(user_access, version):
+
+            resultados = cargar_pases_taller(user_access)
+
+            if not resultados.empty:
+
+                facturas = cargar_facturas()
 
+                if not facturas.empty:
+
+                    resultados = resultados.merge(
+                        facturas
+                        .rename(columns={"No. de Folio": "NoFolio"})
+                        [["NoFolio", "No. de Factura"]],
+                        on="NoFolio",
+                        how="left",
+                    )
+
+            resultados = resultados.reset_index(drop=True)
+
+            indice = build_search_index(
+                resultados,
+                substring_columns={
+                    "NoFolio": True,
+                    "No. de Factura": False,
+                    "Oste": False,
+                },
+                exact_columns=[
+                    "Tipo de Proveedor",
+                    "Empresa",
+                    "Estado",
+                    "Capturo",
+                ]
+            )
+
+            return resultados, indice
+
+        # =================================
+        # LOADERS
+        # =================================
+        # cache entries are tagged by table, writes bump the table version
         user_access = tuple(
             access.lower()
             for access in st.session_state["user"].get("access", [])
@@ -635,35 +907,20 @@ if has_autorizacion:
         # =================================
         # Load Refacciones (Supabase)
         # =================================
-        @st.cache_data(ttl=300)
+        @cached_tables("parts", ttl=300)
         def cargar_refacciones():
             supabase = get_supabase_client()
 
-            page_size = 1000
-            start = 0
-            all_rows = []
-
-            while True:
-                response = (
-                    supabase
-                    .table("parts")
-                    .select("*")
-                    .range(start, start + page_size - 1)
-                    .execute()
-                )
-
-                data = response.data
-                if not data:
-                    break
-
-                all_rows.extend(data)
-                start += page_size
+            df = sync_table(
+                supabase,
+                "parts",
+                watermark="id",
+                full_sync_interval=300
+            )
 
-            if not all_rows:
+            if df.empty:
                 return pd.DataFrame(columns=["Parte", "Tipo"])
 
-            df = pd.DataFrame(all_rows)
-
             df.columns = df.columns.str.strip().str.lower()
 
             df = df.rename(columns={
@@ -761,27 +1018,19 @@ if has_autorizacion:
                     empresas = sorted(pases_df["Empresa"].dropna().unique())
                     total_global = len(pases_df)
 
+                    # one grouped count instead of four masks per empresa
+                    conteo_empresa = pases_df.groupby("Empresa").size()
+                    conteo_estado = pases_df.groupby(["Empresa", "Estado"]).size()
+
                     for empresa in empresas:
 
-                        df_emp = pases_df[pases_df["Empresa"] == empresa]
-                        total_emp = len(df_emp)
+                        total_emp = int(conteo_empresa.get(empresa, 0))
                         pct = (total_emp / total_global * 100) if total_global else 0
 
-                        pendientes = len(
-                            df_emp[df_emp["Estado"] == "Inicio / Nuevo"]
-                        )
-
-                        proceso = len(
-                            df_emp[df_emp["Estado"] == "En Curso / Proceso"]
-                        )
-
-                        completadas = len(
-                            df_emp[df_emp["Estado"] == "Cerrado / Terminado"]
-                        )
-
-                        canceladas = len(
-                            df_emp[df_emp["Estado"] == "Cerrado / Cancelado"]
-                        )
+                        pendientes = int(conteo_estado.get((empresa, "Inicio / Nuevo"), 0))
+                        proceso = int(conteo_estado.get((empresa, "En Curso / Proceso"), 0))
+                        completadas = int(conteo_estado.get((empresa, "Cerrado / Terminado"), 0))
+                        canceladas = int(conteo_estado.get((empresa, "Cerrado / Cancelado"), 0))
 
                         with st.container(border=True):
 
@@ -803,68 +1052,27 @@ if has_autorizacion:
             # ====================================================
             with tab_distribucion:
 
-                @st.cache_data(ttl=300)
-                def cargar_tipos_parte():
+                # counted server side, the cached SERVICES frame is the fallback
+                @cached_tables("SERVICES", ttl=300)
+                def contar_tipos_parte():
 
                     supabase = get_supabase_client()
 
-                    page_size = 1000
-                    start = 0
-                    all_rows = []
-
-                    while True:
-                        response = (
-                            supabase
-                            .table("SERVICES")
-                            .select('"Tipo De Parte"')
-                            .range(start, start + page_size - 1)
-                            .execute()
-                        )
-
-                        data = response.data
-
-                        if not data:
-                            break
-
-                        all_rows.extend(data)
-                        start += page_size
-
-                    if not all_rows:
-                        return pd.DataFrame(columns=["Tipo De Parte"])
-
-                    df = pd.DataFrame(all_rows)
-
-                    if "Tipo De Parte" not in df.columns:
-                        return pd.DataFrame(columns=["Tipo De Parte"])
-
-                    df["Tipo De Parte"] = (
-                        df["Tipo De Parte"]
-                        .fillna("")
-                        .astype(str)
-                        .str.strip()
+                    return grouped_counts(
+                        supabase,
+                        "SERVICES",
+                        "Tipo De Parte",
+                        fallback=cargar_services
                     )
 
-                    df = df[
-                        (df["Tipo De Parte"] != "")
-                        & (df["Tipo De Parte"].str.lower() != "nan")
-                        & (df["Tipo De Parte"].str.lower() != "none")
-                        & (df["Tipo De Parte"].str.lower() != "null")
-                    ]
-
-                    return df
 
+                tipos_conteo = contar_tipos_parte()
 
-                tipos_df = cargar_tipos_parte()
-
-                if tipos_df.empty:
+                if tipos_conteo.empty:
                     st.info("No hay datos disponibles en Tipo De Parte.")
                 else:
 
-                    conteo_tipos = (
-                        tipos_df["Tipo De Parte"]
-                        .value_counts()
-                        .reset_index()
-                    )
+                    conteo_tipos = tipos_conteo.reset_index()
 
                     conteo_tipos.columns = ["Tipo De Parte", "Cantidad"]
 
@@ -1256,6 +1464,47 @@ if has_autorizacion:
                         else:
                             st.info("No hay datos disponibles.")
 
+                    # =============================================
+                    # BATCH FACTURAS
+                    # =============================================
+                    sin_factura = merged[
+                        merged["No. de Factura"].isna()
+                        | (merged["No. de Factura"].astype(str).str.strip() == "")
+                    ]
+
+                    if not sin_factura.empty:
+
+                        with st.expander("Asignar facturas en lote"):
+
+                            lote_df = st.data_editor(
+                                pd.DataFrame({
+                                    "NoFolio": sin_factura["NoFolio"].values,
+                                    "No. de Factura": "",
+                                }),
+                                disabled=["NoFolio"],
+                                hide_index=True,
+                                use_container_width=True,
+                                key="lote_facturas"
+                            )
+
+                            if st.button(
+                                "Guardar Facturas",
+                                key="guardar_lote_facturas",
+                                type="primary"
+                            ):
+
+                                asignadas = {
+                                    r["NoFolio"]: str(r["No. de Factura"]).strip()
+                                    for r in lote_df.to_dict(orient="records")
+                                    if str(r["No. de Factura"] or "").strip() != ""
+                                }
+
+                                if asignadas:
+                                    guardar_facturas(asignadas)
+                                    st.rerun()
+                                else:
+                                    st.warning("Capture al menos un No. de Factura.")
+
         # =============================
         # LATEST ACTIVITY
         # =============================
@@ -1368,38 +1617,44 @@ if has_autorizacion:
             return str(x)
 
         def render_pases_tab(
-            source_df,
+            estados,
             estado_label,
             session_key,
             button_prefix,
         ):
-            source_df = source_df.sort_values(
-                "Fecha",
-                ascending=False
-            )
+            total = contar_pases(user_access, estados)
 
-            if source_df.empty:
+            if total == 0:
                 st.info(f"No hay pases en estado {estado_label}.")
                 return
 
-            CARDS_PER_PAGE = 10
-
-            st.session_state.setdefault(session_key, 0)
-
             total_pages = max(
                 1,
-                (len(source_df) + CARDS_PER_PAGE - 1) // CARDS_PER_PAGE
+                (total + CARDS_PER_PAGE - 1) // CARDS_PER_PAGE
             )
 
-            st.session_state[session_key] = min(
-                st.session_state[session_key],
-                total_pages - 1
-            )
+            # cursores[i] opens page i; only pages already visited are known
+            cursores_key = f"{session_key}_cursores"
+
+            st.session_state.setdefault(session_key, 0)
+            st.session_state.setdefault(cursores_key, [None])
+
+            if st.session_state[session_key] >= len(st.session_state[cursores_key]):
+                st.session_state[session_key] = 0
+                st.session_state[cursores_key] = [None]
+
+            cursor = st.session_state[cursores_key][st.session_state[session_key]]
 
-            start = st.session_state[session_key] * CARDS_PER_PAGE
-            end = start + CARDS_PER_PAGE
+            page_df, siguiente = cargar_pagina_pases(
+                user_access,
+                estados,
+                cursor
+            )
 
-            page_df = source_df.iloc[start:end]
+            if page_df.empty and st.session_state[session_key] > 0:
+                st.session_state[session_key] = 0
+                st.session_state[cursores_key] = [None]
+                st.rerun()
 
             # ============================
             # CARDS
@@ -1533,10 +1788,15 @@ if has_autorizacion:
                 if st.button(
                     "Siguiente ➡",
                     key=f"next_{button_prefix}",
-                    disabled=st.session_state[session_key] >= total_pages - 1,
+                    disabled=siguiente is None,
                     use_container_width=True,
                 ):
-                    st.session_state[session_key] += 1
+                    pagina = st.session_state[session_key] + 1
+                    cursores = st.session_state[cursores_key][:pagina]
+                    cursores.append(siguiente)
+
+                    st.session_state[cursores_key] = cursores
+                    st.session_state[session_key] = pagina
                     st.rerun()
 
         st.subheader("Pases de Taller")
@@ -1549,7 +1809,7 @@ if has_autorizacion:
 
         with tab_nuevos:
             render_pases_tab(
-                pases_df[pases_df["Estado"] == "Inicio / Nuevo"],
+                ("Inicio / Nuevo",),
                 "Inicio / Nuevo",
                 "page_nuevos",
                 "nuevo",
@@ -1557,7 +1817,7 @@ if has_autorizacion:
 
         with tab_proceso:
             render_pases_tab(
-                pases_df[pases_df["Estado"] == "En Curso / Proceso"],
+                ("En Curso / Proceso",),
                 "En Curso / Proceso",
                 "page_proceso",
                 "proceso",
@@ -1565,12 +1825,10 @@ if has_autorizacion:
 
         with tab_terminados:
             render_pases_tab(
-                pases_df[
-                    pases_df["Estado"].isin([
-                        "Cerrado / Terminado",
-                        "Cerrado / Cancelado",
-                    ])
-                ],
+                (
+                    "Cerrado / Terminado",
+                    "Cerrado / Cancelado",
+                ),
                 "Cerrado",
                 "page_terminados",
                 "terminado",
@@ -1649,8 +1907,6 @@ if has_autorizacion:
                             comentario=motivo.strip()
                         )
 
-                        refresh_cached_data()
-
                         st.session_state.modal_reabrir = None
                         st.session_state.modal_reporte = None
                         st.session_state.modal_factura = None
@@ -1701,7 +1957,6 @@ if has_autorizacion:
                     # If editable and user typed something → save
                     if factura_vacia and nueva_factura.strip() != "":
                         guardar_factura(folio, nueva_factura.strip())
-                        refresh_cached_data()
 
                     st.session_state.modal_factura = None
                     st.session_state.modal_factura_open = False
@@ -1847,64 +2102,45 @@ if has_autorizacion:
             # =================================
             if st.session_state.buscar_trigger:
 
-                resultados = pases_df.copy()
+                base_busqueda, indice = cargar_indice_busqueda(
+                    user_access,
+                    table_version(*ACCESS_TABLE_MAP.values(), "INVOICES")
+                )
 
-                if not facturas_df.empty:
+                # each filter is a set of row positions, intersected below
+                coincidencias = []
 
-                    resultados = resultados.merge(
-                        facturas_df[
-                            ["NoFolio", "No. de Factura"]
-                        ],
-                        on="NoFolio",
-                        how="left",
-                    )
                 # FOLIO
                 if f_folio:
-                    resultados = resultados[resultados["NoFolio"].str.contains(f_folio)]
+                    coincidencias.append(search_substring(indice, "NoFolio", f_folio))
                 # NO. FACTURA
                 if f_factura:
-                    resultados = resultados[
-                        resultados["No. de Factura"]
-                        .fillna("")
-                        .astype(str)
-                        .str.contains(
-                            f_factura,
-                            case=False,
-                            na=False,
-                        )
-                    ]
+                    coincidencias.append(search_substring(indice, "No. de Factura", f_factura))
                 # OSTE
                 if f_oste:
-                    resultados = resultados[
-                        resultados["Oste"]
-                        .fillna("")
-                        .astype(str)
-                        .str.contains(
-                            f_oste,
-                            case=False,
-                            na=False,
-                        )
-                    ]
+                    coincidencias.append(search_substring(indice, "Oste", f_oste))
                 # TIPO PROVEEDOR
                 if f_tipo_proveedor != "Todos":
-                    resultados = resultados[
-                        resultados["Tipo de Proveedor"] == f_tipo_proveedor
-                    ]
+                    coincidencias.append(search_exact(indice, "Tipo de Proveedor", f_tipo_proveedor))
 
                 if f_empresa != "Selecciona empresa":
-                    resultados = resultados[resultados["Empresa"] == f_empresa]
+                    coincidencias.append(search_exact(indice, "Empresa", f_empresa))
 
                 if f_estado != "Selecciona estado":
-                    resultados = resultados[resultados["Estado"] == f_estado]
+                    coincidencias.append(search_exact(indice, "Estado", f_estado))
+
+                if f_capturo != "Todos":
+                    coincidencias.append(search_exact(indice, "Capturo", f_capturo))
+
+                if coincidencias:
+                    posiciones = sorted(set.intersection(*coincidencias))
+                    resultados = base_busqueda.iloc[posiciones]
+                else:
+                    resultados = base_busqueda.copy()
 
                 if f_unidad != "Selecciona unidad":
                     resultados = resultados[
                         resultados["No. de Unidad"].astype(str) == f_unidad]
-                    
-                if f_capturo != "Todos":
-                    resultados = resultados[
-                        resultados["Capturo"] == f_capturo
-                    ]
 
                 if f_fecha:
                     resultados = resultados[resultados["Fecha"].dt.date == f_fecha]
@@ -2109,98 +2345,10 @@ if has_autorizacion:
                 )
 
             # =================================
-            # BUILD MASTER REPORT
+            # MASTER REPORT (cached per data version)
             # =================================
 
-            resultados = pases_df.copy()
-
-            # ---------------------------------
-            # MERGE FACTURAS
-            # ---------------------------------
-
-            if not facturas_df.empty:
-
-                resultados = resultados.merge(
-                    facturas_df[
-                        [
-                            "NoFolio",
-                            "No. de Factura"
-                        ]
-                    ],
-                    on="NoFolio",
-                    how="left",
-                )
-
-            # ---------------------------------
-            # MERGE SERVICES
-            # ---------------------------------
-
-            if not services_df.empty:
-
-                servicios = services_df.copy()
-
-                # clean values
-                for col in [
-                    "Parte",
-                    "Tipo De Parte"
-                ]:
-
-                    if col in servicios.columns:
-
-                        servicios[col] = (
-                            servicios[col]
-                            .fillna("")
-                            .astype(str)
-                            .str.strip()
-                        )
-
-                servicios = servicios[
-                    (
-                        servicios["Parte"] != ""
-                    )
-                    |
-                    (
-                        servicios["Tipo De Parte"] != ""
-                    )
-                ]
-
-                servicios_resumen = (
-                    servicios
-                    .groupby("NoFolio", as_index=False)
-                    .agg(
-                        {
-                            "Parte": lambda x: " | ".join(
-                                sorted(
-                                    set(
-                                        i for i in x
-                                        if i
-                                    )
-                                )
-                            ),
-                            "Tipo De Parte": lambda x: " | ".join(
-                                sorted(
-                                    set(
-                                        i for i in x
-                                        if i
-                                    )
-                                )
-                            ),
-                        }
-                    )
-                )
-
-                servicios_resumen = servicios_resumen.rename(
-                    columns={
-                        "Parte": "Partes",
-                        "Tipo De Parte": "Tipos de Parte",
-                    }
-                )
-
-                resultados = resultados.merge(
-                    servicios_resumen,
-                    on="NoFolio",
-                    how="left",
-                )
+            resultados = cargar_reporte_maestro(user_access)
 
             # =================================
             # APPLY FILTERS
@@ -2648,7 +2796,6 @@ if has_autorizacion:
                                 "Cerrado / Cancelado"
                             )
 
-                            refresh_cached_data()
                             st.session_state.modal_reporte = None
                             st.rerun()
 
@@ -2668,6 +2815,12 @@ if has_autorizacion:
                                 or st.session_state.user.get("email")
                             )
 
+                            cambios = nuevo_cambio(
+                                r["Empresa"],
+                                r["NoFolio"],
+                                usuario
+                            )
+
                             # =================================
                             # UPDATE DESCRIPCION
                             # =================================
@@ -2676,16 +2829,9 @@ if has_autorizacion:
 
                             if descripcion_nueva.strip() != descripcion_original.strip():
 
-                                actualizar_descripcion_pase(
-                                    r["Empresa"],
-                                    r["NoFolio"],
-                                    descripcion_nueva.strip()
-                                )
-
-                                registrar_cambio_log(
-                                    usuario=usuario,
-                                    empresa=r["Empresa"],
-                                    folio=r["NoFolio"],
+                                agregar_cambio(
+                                    cambios,
+                                    {"Descripcion Problema": descripcion_nueva.strip()},
                                     tipo_cambio="Edición Descripción",
                                     estado_anterior=r["Estado"],
                                     estado_nuevo=r["Estado"],
@@ -2696,16 +2842,11 @@ if has_autorizacion:
 
                             if nuevo_estado != estado_actual:
 
-                                actualizar_estado_pase(
-                                    r["Empresa"],
-                                    r["NoFolio"],
-                                    nuevo_estado
-                                )
-
-                                registrar_cambio_log(
-                                    usuario=usuario,
-                                    empresa=r["Empresa"],
-                                    folio=r["NoFolio"],
+                                agregar_cambio(
+                                    cambios,
+                                    {"Estado": nuevo_estado}
+                                    if nuevo_estado in VALID_ESTADOS
+                                    else {},
                                     tipo_cambio="Cambio Estado",
                                     estado_anterior=estado_actual,
                                     estado_nuevo=nuevo_estado,
@@ -2719,16 +2860,9 @@ if has_autorizacion:
                                     oste_anterior = clean(r.get("Oste"))
                                     oste_nuevo = clean(oste_val)
 
-                                    actualizar_oste_pase(
-                                        r["Empresa"],
-                                        r["NoFolio"],
-                                        oste_nuevo
-                                    )
-
-                                    registrar_cambio_log(
-                                        usuario=usuario,
-                                        empresa=r["Empresa"],
-                                        folio=r["NoFolio"],
+                                    agregar_cambio(
+                                        cambios,
+                                        {"Oste": oste_nuevo},
                                         tipo_cambio="Actualización OSTE",
                                         estado_anterior=nuevo_estado,
                                         estado_nuevo=nuevo_estado,
@@ -2757,22 +2891,18 @@ if has_autorizacion:
 
                             if reporte_nuevo != reporte_original:
 
-                                actualizar_no_reporte_pase(
-                                    r["Empresa"],
-                                    r["NoFolio"],
-                                    reporte_nuevo
-                                )
-
-                                registrar_cambio_log(
-                                    usuario=usuario,
-                                    empresa=r["Empresa"],
-                                    folio=r["NoFolio"],
+                                agregar_cambio(
+                                    cambios,
+                                    {"No. de Reporte": reporte_nuevo or None},
                                     tipo_cambio="Actualización No. de Reporte",
                                     estado_anterior=r["Estado"],
                                     estado_nuevo=r["Estado"],
                                     comentario=f"No. de Reporte actualizado: {reporte_original} → {reporte_nuevo}"
                                 )
 
+                            # one PATCH on the company table + one AUDIT insert
+                            aplicar_cambios(cambios)
+
                             # =================================
                             # CREATE MILESTONE
                             # =================================
@@ -2816,14 +2946,21 @@ if has_autorizacion:
 
                             st.session_state.servicios_df = df_final
 
-                            guardar_servicios_refacciones(
+                            fallidas = guardar_servicios_refacciones(
                                 r["NoFolio"],
                                 usuario,
                                 st.session_state.servicios_df,
                                 nuevo_estado
                             )
 
-                            refresh_cached_data()
+                            if fallidas:
+                                for lineas_fallidas, error in fallidas:
+                                    st.error(
+                                        "No se guardaron las líneas "
+                                        f"{', '.join(map(str, lineas_fallidas))}: {error}"
+                                    )
+                                st.stop()
+
                             st.session_state.modal_reporte = None
                             st.rerun()
 
@@ -2914,20 +3051,15 @@ if has_viaticos:
 
             def log_activity(action, page):
 
-                try:
-
-                    supabase.table("user_activity_log").insert({
-
-                        "user_id": user.get("id"),
-                        "user_name": user.get("name"),
-                        "login_counter": st.session_state.get("login_counter"),
-                        "action": action,
-                        "page": page,
+                log_activity_event(supabase, {
 
-                    }).execute()
+                    "user_id": user.get("id"),
+                    "user_name": user.get("name"),
+                    "login_counter": st.session_state.get("login_counter"),
+                    "action": action,
+                    "page": page,
 
-                except Exception as e:
-                    print(e)
+                })
 
             # =================================
             # EMAIL CONFIG
@@ -2982,28 +3114,14 @@ if has_viaticos:
 
                 try:
 
-                    response = (
-                        supabase
-                        .table("profiles")
-                        .select("email")
-                        .eq(
-                            "full_name",
-                            nombre_completo
-                        )
-                        .limit(1)
-                        .execute()
+                    perfil = user_by_name(
+                        supabase,
+                        nombre_completo
                     )
 
-                    if (
-                        response.data
-                        and len(response.data) > 0
-                    ):
+                    if perfil:
 
-                        return (
-                            response
-                            .data[0]
-                            .get("email")
-                        )
+                        return perfil.get("email")
 
                 except Exception as e:
 
@@ -3324,7 +3442,8 @@ if has_viaticos:
                 </div>
                 """
 
-                resend.Emails.send({
+                # sent by the email queue workers, the handler reruns right away
+                enqueue_email({
 
                     "from":
                         "PG Data Analyst <notificaciones@pgdataanalyst.com>",
@@ -3339,84 +3458,34 @@ if has_viaticos:
 
                     "html":
                         html
-                })
+                }, supabase=supabase, referencia=folio)
 
             # =================================
             # LOAD DATA
             # =================================
 
-            @st.cache_data(ttl=30)
+            @cached_tables("solicitud_viaje", ttl=30)
             def cargar_solicitudes():
 
-                all_rows = []
-
-                page_size = 1000
-                start = 0
-
-                while True:
-
-                    response = (
-                        supabase
-                        .table("solicitud_viaje")
-                        .select("*")
-                        .order("created_at", desc=True)
-                        .range(
-                            start,
-                            start + page_size - 1
-                        )
-                        .execute()
-                    )
-
-                    data = response.data or []
-
-                    if len(data) == 0:
-                        break
-
-                    all_rows.extend(data)
-
-                    if len(data) < page_size:
-                        break
-
-                    start += page_size
-
-                return pd.DataFrame(all_rows)
+                return sync_table(
+                    supabase,
+                    "solicitud_viaje",
+                    watermark="created_at",
+                    order_by="created_at",
+                    desc=True
+                )
 
 
-            @st.cache_data(ttl=30)
+            @cached_tables("comprobacion_viaje", ttl=30)
             def cargar_comprobaciones():
 
-                all_rows = []
-
-                page_size = 1000
-                start = 0
-
-                while True:
-
-                    response = (
-                        supabase
-                        .table("comprobacion_viaje")
-                        .select("*")
-                        .order("created_at", desc=True)
-                        .range(
-                            start,
-                            start + page_size - 1
-                        )
-                        .execute()
-                    )
-
-                    data = response.data or []
-
-                    if len(data) == 0:
-                        break
-
-                    all_rows.extend(data)
-
-                    if len(data) < page_size:
-                        break
-
-                    start += page_size
-
-                return pd.DataFrame(all_rows)
+                return sync_table(
+                    supabase,
+                    "comprobacion_viaje",
+                    watermark="created_at",
+                    order_by="created_at",
+                    desc=True
+                )
 
 
             df_solicitudes = cargar_solicitudes()
@@ -4074,7 +4143,7 @@ if has_viaticos:
                                 row["id"]
                             ).execute()
 
-                            st.cache_data.clear()
+                            invalidate_tables("solicitud_viaje")
 
                             st.session_state.toast_actualizado = (
                                 f"Folio "
@@ -4252,7 +4321,7 @@ if has_viaticos:
                             )
 
                             st.success("Solicitud aprobada")
-                            st.cache_data.clear()
+                            invalidate_tables("solicitud_viaje")
                             st.rerun()
 
                     # RECHAZAR
@@ -4358,7 +4427,7 @@ if has_viaticos:
                             )
 
                             st.error("Solicitud rechazada")
-                            st.cache_data.clear()
+                            invalidate_tables("solicitud_viaje")
                             st.rerun()
 
             # =================================
@@ -5251,7 +5320,7 @@ if has_viaticos:
                                         comprobacion_row.get("id")
                                     ).execute()
 
-                                    st.cache_data.clear()
+                                    invalidate_tables("comprobacion_viaje")
 
                                     st.success(
                                         "Comprobación actualizada correctamente."
@@ -5373,7 +5442,7 @@ if has_viaticos:
                                             "Solicitud concluida"
                                         )
 
-                                        st.cache_data.clear()
+                                        invalidate_tables("solicitud_viaje", "comprobacion_viaje")
                                         st.rerun()
 
                                 with btn2:
@@ -5488,7 +5557,7 @@ if has_viaticos:
                                             "Solicitud rechazada"
                                         )
 
-                                        st.cache_data.clear()
+                                        invalidate_tables("solicitud_viaje", "comprobacion_viaje")
                                         st.rerun()    
 
 
@@ -5713,340 +5782,174 @@ if has_viaticos:
             # =================================
             # DESCARGAR REPORTE
             # =================================
+            # (columna reporte, origen, columna origen, default)
+            REPORTE_GENERAL = [
+                ("Folio Solicitud", "solicitud", "folio_solicitud", ""),
+                ("Folio Comprobacion", "comprobacion", "folio_comprobacion", ""),
+                ("Estatus", "comprobacion", "estatus", ""),
+                ("Empleado Solicita", "solicitud", "nombre_empleado_solicita", ""),
+                ("Fecha Solicitud", "solicitud", "fecha_solicitud", ""),
+                ("Fecha Comprobacion", "comprobacion", "created_at", ""),
+                ("Fecha Inicio", "solicitud", "fecha_inicio", ""),
+                ("Fecha Fin", "solicitud", "fecha_fin", ""),
+                ("Empresa Brinda Servicio", "solicitud", "empresa_brinda_servicio", ""),
+                ("Empresa Cargo Gastos", "solicitud", "empresa_cargo_gastos", ""),
+                ("Unidad Negocio", "solicitud", "unidad_negocio", ""),
+                ("Sucursal", "solicitud", "sucursal", ""),
+                ("Sucursal Especificar", "solicitud", "sucursal_especificar", ""),
+                ("Nombre Cliente", "solicitud", "nombre_cliente", ""),
+                ("Registro SAC Ventas", "solicitud", "folio_sac", ""),
+                ("Motivo Viaje", "solicitud", "motivo_viaje", ""),
+                ("Observaciones Solicitud", "solicitud", "observaciones", ""),
+                ("Observaciones Comprobacion", "comprobacion", "observaciones", ""),
+                ("Monto Solicitado", "solicitud", "total_estimado", 0),
+                ("Total Comprobado", "comprobacion", "total_comprobado", 0),
+                ("Anticipo Viaje", "comprobacion", "anticipo_viaje", 0),
+                ("Diferencia Cargo Favor", "comprobacion", "diferencia_cargo_favor", 0),
+            ]
 
-            reporte_rows = []
-
-            for _, row in df_finalizadas.iterrows():
-
-                solicitud_match = df_solicitudes[
-                    df_solicitudes["folio_solicitud"]
-                    .astype(str)
-                    ==
-                    str(row.get("folio_solicitud", ""))
-                ]
-
-                if not solicitud_match.empty:
-
-                    solicitud_row = (
-                        solicitud_match
-                        .iloc[0]
-                        .to_dict()
-                    )
-
-                else:
-
-                    solicitud_row = {}
-
-                # =================================
-                # CONCEPTOS SOLICITUD
-                # =================================
-
-                conceptos_solicitud = solicitud_row.get("conceptos")
-
-                if not isinstance(conceptos_solicitud, list):
-                    conceptos_solicitud = []
-
-                if len(conceptos_solicitud) == 0:
-                    conceptos_solicitud = [{}]
-
-                # =================================
-                # CONCEPTOS COMPROBACION
-                # =================================
-
-                conceptos_comprobacion = row.get("conceptos")
+            CAMPOS_CONCEPTO_SOLICITUD = [
+                "Tipo",
+                "Descripcion",
+                "Monto",
+                "Tipo Cambio",
+                "Aprobado",
+                "Razon",
+            ]
 
-                if not isinstance(conceptos_comprobacion, list):
-                    conceptos_comprobacion = []
+            CAMPOS_CONCEPTO_COMPROBACION = [
+                "Tipo",
+                "Descripcion",
+                "Fecha Factura",
+                "Folio",
+                "Proveedor",
+                "Moneda",
+                "Monto",
+                "Comprobante",
+                "Aplica IVA",
+                "IVA %",
+                "Aplica Retencion",
+                "Impuesto Acreditable",
+                "Total Comprobado",
+            ]
 
-                if len(conceptos_comprobacion) == 0:
-                    conceptos_comprobacion = [{}]
+            # one row per concepto, keyed by (_fila, _pos) for the positional merge;
+            # a missing key is "", a key stored as None stays None
+            def explotar_conceptos(conceptos, campos, prefijo):
 
-                max_len = max(
-                    len(conceptos_solicitud),
-                    len(conceptos_comprobacion)
+                listas = conceptos.map(
+                    lambda v: v if isinstance(v, list) and len(v) > 0 else [{}]
                 )
 
-                for i in range(max_len):
-
-                    concepto_sol = (
-                        conceptos_solicitud[i]
-                        if i < len(conceptos_solicitud)
-                        else {}
-                    )
-
-                    concepto_comp = (
-                        conceptos_comprobacion[i]
-                        if i < len(conceptos_comprobacion)
-                        else {}
-                    )
-
-                    reporte_rows.append({
-
-                        # =================================
-                        # GENERAL
-                        # =================================
-
-                        "Folio Solicitud":
-                            solicitud_row.get(
-                                "folio_solicitud",
-                                ""
-                            ),
-
-                        "Folio Comprobacion":
-                            row.get(
-                                "folio_comprobacion",
-                                ""
-                            ),
-
-                        "Estatus":
-                            row.get(
-                                "estatus",
-                                ""
-                            ),
-
-                        "Empleado Solicita":
-                            solicitud_row.get(
-                                "nombre_empleado_solicita",
-                                ""
-                            ),
-
-                        "Fecha Solicitud":
-                            solicitud_row.get(
-                                "fecha_solicitud",
-                                ""
-                            ),
-
-                        "Fecha Comprobacion":
-                            row.get(
-                                "created_at",
-                                ""
-                            ),
-
-                        "Fecha Inicio":
-                            solicitud_row.get(
-                                "fecha_inicio",
-                                ""
-                            ),
-
-                        "Fecha Fin":
-                            solicitud_row.get(
-                                "fecha_fin",
-                                ""
-                            ),
-
-                        "Empresa Brinda Servicio":
-                            solicitud_row.get(
-                                "empresa_brinda_servicio",
-                                ""
-                            ),
-
-                        "Empresa Cargo Gastos":
-                            solicitud_row.get(
-                                "empresa_cargo_gastos",
-                                ""
-                            ),
-
-                        "Unidad Negocio":
-                            solicitud_row.get(
-                                "unidad_negocio",
-                                ""
-                            ),
-
-                        "Sucursal":
-                            solicitud_row.get(
-                                "sucursal",
-                                ""
-                            ),
-
-                        "Sucursal Especificar":
-                            solicitud_row.get(
-                                "sucursal_especificar",
-                                ""
-                            ),
-
-                        "Nombre Cliente":
-                            solicitud_row.get(
-                                "nombre_cliente",
-                                ""
-                            ),
-
-                        "Registro SAC Ventas":
-                            solicitud_row.get(
-                                "folio_sac",
-                                ""
-                            ),
-
-                        "Motivo Viaje":
-                            solicitud_row.get(
-                                "motivo_viaje",
-                                ""
-                            ),
-
-                        "Observaciones Solicitud":
-                            solicitud_row.get(
-                                "observaciones",
-                                ""
-                            ),
-
-                        "Observaciones Comprobacion":
-                            row.get(
-                                "observaciones",
-                                ""
-                            ),
-
-                        # =================================
-                        # TOTALES
-                        # =================================
-
-                        "Monto Solicitado":
-                            solicitud_row.get(
-                                "total_estimado",
-                                0
-                            ),
-
-                        "Total Comprobado":
-                            row.get(
-                                "total_comprobado",
-                                0
-                            ),
-
-                        "Anticipo Viaje":
-                            row.get(
-                                "anticipo_viaje",
-                                0
-                            ),
-
-                        "Diferencia Cargo Favor":
-                            row.get(
-                                "diferencia_cargo_favor",
-                                0
-                            ),
-
-                        # =================================
-                        # CONCEPTOS SOLICITUD
-                        # =================================
-
-                        "Solicitud Tipo":
-                            concepto_sol.get(
-                                "Tipo",
-                                ""
-                            ),
-
-                        "Solicitud Descripcion":
-                            concepto_sol.get(
-                                "Descripcion",
-                                ""
-                            ),
-
-                        "Solicitud Monto":
-                            concepto_sol.get(
-                                "Monto",
-                                ""
-                            ),
+                filas = listas.explode()
+                items = [
+                    item if isinstance(item, dict) else {}
+                    for item in filas.tolist()
+                ]
 
-                        "Solicitud Tipo Cambio":
-                            concepto_sol.get(
-                                "Tipo Cambio",
-                                ""
-                            ),
+                detalle = pd.DataFrame(
+                    {
+                        f"{prefijo} {campo}": pd.Series(
+                            [item.get(campo, "") for item in items],
+                            dtype=object
+                        )
+                        for campo in campos
+                    }
+                )
 
-                        "Solicitud Aprobado":
-                            concepto_sol.get(
-                                "Aprobado",
-                                ""
-                            ),
+                detalle["_fila"] = filas.index
+                detalle["_pos"] = filas.groupby(level=0).cumcount().values
 
-                        "Solicitud Razon":
-                            concepto_sol.get(
-                                "Razon",
-                                ""
-                            ),
+                return detalle.reset_index(drop=True)
 
-                        # =================================
-                        # CONCEPTOS COMPROBACION
-                        # =================================
+            def construir_reporte_finalizadas(df_finalizadas, df_solicitudes):
 
-                        "Comprobacion Tipo":
-                            concepto_comp.get(
-                                "Tipo",
-                                ""
-                            ),
+                if df_finalizadas.empty:
+                    return pd.DataFrame()
 
-                        "Comprobacion Descripcion":
-                            concepto_comp.get(
-                                "Descripcion",
-                                ""
-                            ),
+                comprobaciones = df_finalizadas.reset_index(drop=True)
 
-                        "Comprobacion Fecha Factura":
-                            concepto_comp.get(
-                                "Fecha Factura",
-                                ""
-                            ),
+                folios = comprobaciones["folio_solicitud"].astype(str)
 
-                        "Comprobacion Folio":
-                            concepto_comp.get(
-                                "Folio",
-                                ""
-                            ),
+                # solicitudes indexed by folio once (first match wins)
+                solicitudes = (
+                    df_solicitudes
+                    .assign(_folio=df_solicitudes["folio_solicitud"].astype(str))
+                    .drop_duplicates(subset="_folio")
+                    .set_index("_folio")
+                    .reindex(folios)
+                    .set_index(comprobaciones.index)
+                )
 
-                        "Comprobacion Proveedor":
-                            concepto_comp.get(
-                                "Proveedor",
-                                ""
-                            ),
+                # comprobaciones without a solicitud get the defaults, not NaN
+                encontrada = folios.isin(
+                    df_solicitudes["folio_solicitud"].astype(str)
+                ).values
 
-                        "Comprobacion Moneda":
-                            concepto_comp.get(
-                                "Moneda",
-                                ""
-                            ),
+                general = pd.DataFrame(index=comprobaciones.index)
 
-                        "Comprobacion Monto":
-                            concepto_comp.get(
-                                "Monto",
-                                ""
-                            ),
+                for titulo, origen, columna, default in REPORTE_GENERAL:
 
-                        "Comprobacion Comprobante":
-                            concepto_comp.get(
-                                "Comprobante",
-                                ""
-                            ),
+                    fuente = solicitudes if origen == "solicitud" else comprobaciones
 
-                        "Comprobacion Aplica IVA":
-                            concepto_comp.get(
-                                "Aplica IVA",
-                                ""
-                            ),
+                    if columna not in fuente.columns:
+                        general[titulo] = default
+                    elif origen == "solicitud":
+                        general[titulo] = (
+                            fuente[columna]
+                            .astype(object)
+                            .where(encontrada, default)
+                        )
+                    else:
+                        general[titulo] = fuente[columna]
+
+                sin_conceptos = pd.Series(None, index=comprobaciones.index, dtype=object)
+
+                conceptos = explotar_conceptos(
+                    solicitudes.get("conceptos", sin_conceptos),
+                    CAMPOS_CONCEPTO_SOLICITUD,
+                    "Solicitud"
+                ).merge(
+                    explotar_conceptos(
+                        comprobaciones.get("conceptos", sin_conceptos),
+                        CAMPOS_CONCEPTO_COMPROBACION,
+                        "Comprobacion"
+                    ),
+                    on=["_fila", "_pos"],
+                    how="outer",
+                    indicator="_lado"
+                )
 
-                        "Comprobacion IVA %":
-                            concepto_comp.get(
-                                "IVA %",
-                                ""
-                            ),
+                # positions past the end of the shorter list read as {}
+                for prefijo, lado in (
+                    ("Solicitud", "right_only"),
+                    ("Comprobacion", "left_only"),
+                ):
+                    columnas = [
+                        c for c in conceptos.columns
+                        if c.startswith(f"{prefijo} ")
+                    ]
 
-                        "Comprobacion Aplica Retencion":
-                            concepto_comp.get(
-                                "Aplica Retencion",
-                                ""
-                            ),
+                    conceptos[columnas] = conceptos[columnas].astype(object)
+                    conceptos.loc[conceptos["_lado"] == lado, columnas] = ""
 
-                        "Comprobacion Impuesto Acreditable":
-                            concepto_comp.get(
-                                "Impuesto Acreditable",
-                                ""
-                            ),
+                columnas_conceptos = [
+                    c for c in conceptos.columns
+                    if c not in ("_fila", "_pos", "_lado")
+                ]
 
-                        "Comprobacion Total Comprobado":
-                            concepto_comp.get(
-                                "Total Comprobado",
-                                ""
-                            )
-                    })
+                return (
+                    conceptos
+                    .sort_values(["_fila", "_pos"])
+                    .merge(general, left_on="_fila", right_index=True)
+                    [list(general.columns) + columnas_conceptos]
+                    .reset_index(drop=True)
+                    .infer_objects()
+                )
 
-            df_reporte = pd.DataFrame(
-                reporte_rows
+            df_reporte = construir_reporte_finalizadas(
+                df_finalizadas,
+                df_solicitudes
             )
 
             output = BytesIO()
@@ -7,6 +7,7 @@ import numpy as np
 from io import BytesIO
 from auth import require_login, require_access
 from pages.css import load_css
+from activity_log import log_activity_event
 import re
 import io
 import html
@@ -80,20 +81,15 @@ supabase = get_supabase()
 
 def log_activity(action, page):
 
-    try:
+    log_activity_event(supabase, {
 
-        supabase.table("user_activity_log").insert({
+        "user_id": user.get("id"),
+        "user_name": user.get("name"),
+        "login_counter": st.session_state.get("login_counter"),
+        "action": action,
+        "page": page,
 
-            "user_id": user.get("id"),
-            "user_name": user.get("name"),
-            "login_counter": st.session_state.get("login_counter"),
-            "action": action,
-            "page": page,
-
-        }).execute()
-
-    except Exception as e:
-        print(e)
+    })
 
 # =================================
 # TABS
@@ -8,6 +8,12 @@ import unicodedata
 import io
 import numpy as np
 from pages.css import load_css
+from activity_log import log_activity_event
+from part_names import normalize_part_names, build_parts_lookup
+from supabase_loader import fetch_table, sync_table, select_columns, anio_mes_facets
+from table_cache import cached_tables, invalidate_tables
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 # =================================
 # RELEASE CHANNEL
@@ -88,20 +94,15 @@ supabase = get_supabase()
 
 def log_activity(action, page):
 
-    try:
-
-        supabase.table("user_activity_log").insert({
+    log_activity_event(supabase, {
 
-            "user_id": user.get("id"),
-            "user_name": user.get("name"),
-            "login_counter": st.session_state.get("login_counter"),
-            "action": action,
-            "page": page,
+        "user_id": user.get("id"),
+        "user_name": user.get("name"),
+        "login_counter": st.session_state.get("login_counter"),
+        "action": action,
+        "page": page,
 
-        }).execute()
-
-    except Exception as e:
-        print(e)
+    })
 
 # =================================
 # Navigation
@@ -117,286 +118,139 @@ st.title("📊 Consulta, Carga, Preparación y Generación de Reportes")
 # =================================
 # LOADERS
 # =================================
-@st.cache_data
-def load_refacciones_igloo():
-    supabase = get_supabase()
-
-    all_data = []
-    limit = 1000
-    offset = 0
-
-    while True:
-        res = (
-            supabase
-            .table("refacciones_data_igloo")
-            .select("*")
-            .range(offset, offset + limit - 1)
-            .execute()
-        )
-
-        data = res.data
-
-        if not data:
-            break
-
-        all_data.extend(data)
-
-        if len(data) < limit:
-            break
-
-        offset += limit
-
-    return pd.DataFrame(all_data)
-
-@st.cache_data
-def load_ostes_igloo():
-    supabase = get_supabase()
-
-    all_data = []
-    limit = 1000
-    offset = 0
-
-    while True:
-        res = (
-            supabase
-            .table("ostes_igloo")
-            .select("*")
-            .range(offset, offset + limit - 1)
-            .execute()
-        )
-
-        data = res.data
-
-        if not data:
-            break
-
-        all_data.extend(data)
-
-        if len(data) < limit:
-            break
-
-        offset += limit
-
-    return pd.DataFrame(all_data)
-
-@st.cache_data
-def load_mano_obra_igloo():
-    supabase = get_supabase()
-
-    all_data = []
-    limit = 1000
-    offset = 0
-
-    while True:
-        res = (
-            supabase
-            .table("mano_obra_igloo")
-            .select("*")
-            .range(offset, offset + limit - 1)
-            .execute()
-        )
-
-        data = res.data
-
-        if not data:
-            break
-
-        all_data.extend(data)
-
-        if len(data) < limit:
-            break
-
-        offset += limit
-
-    return pd.DataFrame(all_data)
-
-@st.cache_data
-def load_refacciones_lincoln():
-    supabase = get_supabase()
-    all_data, limit, offset = [], 1000, 0
-
-    while True:
-        res = supabase.table("refacciones_data_lincoln").select("*").range(offset, offset + limit - 1).execute()
-        data = res.data
-        if not data: break
-        all_data.extend(data)
-        if len(data) < limit: break
-        offset += limit
+# Reportes datasets share one byte budget (CACHE_BUDGET_MB) with LRU
+# eviction; TTLs pick up uploads from other sessions and
+# upload_to_supabase invalidates the written table right away.
+REPORTES_DATA_TTL = 900
+REPORTES_LOOKUP_TTL = 3600
+
+# one refacciones / OSTES / mano de obra table set per company
+COMPANY_TABLES = {
+    "IGLOO": "igloo",
+    "LINCOLN FREIGHT": "lincoln",
+    "PICUS": "picus",
+    "SET FREIGHT INTERNATIONAL": "setfreight",
+    "SET LOGIS PLUS": "logis",
+}
 
-    return pd.DataFrame(all_data)
+CompanyDataset = namedtuple(
+    "CompanyDataset",
+    ["refacciones", "ostes", "mano_obra"]
+)
 
-@st.cache_data
-def load_ostes_lincoln():
-    supabase = get_supabase()
-    all_data, limit, offset = [], 1000, 0
 
-    while True:
-        res = supabase.table("ostes_lincoln").select("*").range(offset, offset + limit - 1).execute()
-        data = res.data
-        if not data: break
-        all_data.extend(data)
-        if len(data) < limit: break
-        offset += limit
+def company_dataset_tables(empresa):
 
-    return pd.DataFrame(all_data)
+    suffix = COMPANY_TABLES[empresa]
 
-@st.cache_data
-def load_mano_obra_lincoln():
-    supabase = get_supabase()
-    all_data, limit, offset = [], 1000, 0
+    return CompanyDataset(
+        refacciones=f"refacciones_data_{suffix}",
+        ostes=f"ostes_{suffix}",
+        mano_obra=f"mano_obra_{suffix}",
+    )
 
-    while True:
-        res = supabase.table("mano_obra_lincoln").select("*").range(offset, offset + limit - 1).execute()
-        data = res.data
-        if not data: break
-        all_data.extend(data)
-        if len(data) < limit: break
-        offset += limit
+# anio/mes filters pushed into the query. mes is stored with mixed case
+# and stray spaces, so it is matched with ilike; no English month name
+# contains another, so the wildcards cannot pick up a second month.
+# anio may be text ("2024", "2024.0", " 2024") or numeric depending on
+# the table: text is narrowed with ilike, numeric with eq, and
+# filtrar_anio then applies the same to_numeric match as the facets.
+def period_filters(anio=None, mes=None, anio_texto=True):
 
-    return pd.DataFrame(all_data)
+    filters = []
 
-@st.cache_data
-def load_refacciones_picus():
-    supabase = get_supabase()
-    all_data, limit, offset = [], 1000, 0
+    if anio is not None and anio_texto:
+        filters.append(("ilike", "anio", f"%{int(anio)}%"))
 
-    while True:
-        res = supabase.table("refacciones_data_picus").select("*").range(offset, offset + limit - 1).execute()
-        data = res.data
-        if not data: break
-        all_data.extend(data)
-        if len(data) < limit: break
-        offset += limit
+    elif anio is not None:
+        filters.append(("eq", "anio", int(anio)))
 
-    return pd.DataFrame(all_data)
+    if mes is not None:
+        filters.append(("ilike", "mes", f"%{mes.strip().lower()}%"))
 
-@st.cache_data
-def load_ostes_picus():
-    supabase = get_supabase()
-    all_data, limit, offset = [], 1000, 0
+    return filters
 
-    while True:
-        res = supabase.table("ostes_picus").select("*").range(offset, offset + limit - 1).execute()
-        data = res.data
-        if not data: break
-        all_data.extend(data)
-        if len(data) < limit: break
-        offset += limit
 
-    return pd.DataFrame(all_data)
+def filtrar_anio(df, anio):
 
-@st.cache_data
-def load_mano_obra_picus():
-    supabase = get_supabase()
-    all_data, limit, offset = [], 1000, 0
-
-    while True:
-        res = supabase.table("mano_obra_picus").select("*").range(offset, offset + limit - 1).execute()
-        data = res.data
-        if not data: break
-        all_data.extend(data)
-        if len(data) < limit: break
-        offset += limit
+    if anio is None or df.empty or "anio" not in df.columns:
+        return df
 
-    return pd.DataFrame(all_data)
+    return df[pd.to_numeric(df["anio"], errors="coerce") == int(anio)]
 
-@st.cache_data
-def load_refacciones_setfreight():
+# the three tables of a company are read concurrently, so a consulta
+# costs the slowest table instead of the sum of the three. Without a
+# period the tables go through the delta sync; with one, only the rows
+# of that year/month are fetched.
+@cached_tables(
+    tables_of=company_dataset_tables,
+    ttl=REPORTES_DATA_TTL,
+    budget="reportes"
+)
+def load_company_frames(empresa, anio=None, mes=None):
     supabase = get_supabase()
-    all_data, limit, offset = [], 1000, 0
 
-    while True:
-        res = supabase.table("refacciones_data_setfreight").select("*").range(offset, offset + limit - 1).execute()
-        data = res.data
-        if not data: break
-        all_data.extend(data)
-        if len(data) < limit: break
-        offset += limit
+    tables = company_dataset_tables(empresa)
+    filters = period_filters(anio, mes)
 
-    return pd.DataFrame(all_data)
+    def load(table):
+        if not filters:
+            return sync_table(supabase, table)
 
-@st.cache_data
-def load_ostes_setfreight():
-    supabase = get_supabase()
-    all_data, limit, offset = [], 1000, 0
-
-    while True:
-        res = supabase.table("ostes_setfreight").select("*").range(offset, offset + limit - 1).execute()
-        data = res.data
-        if not data: break
-        all_data.extend(data)
-        if len(data) < limit: break
-        offset += limit
+        try:
+            df = fetch_table(supabase, table, filters=filters)
 
-    return pd.DataFrame(all_data)
+        except Exception as e:
 
-@st.cache_data
-def load_mano_obra_setfreight():
-    supabase = get_supabase()
-    all_data, limit, offset = [], 1000, 0
+            # 42883: anio is numeric in this table, ilike does not apply
+            if anio is None or getattr(e, "code", None) != "42883":
+                raise
 
-    while True:
-        res = supabase.table("mano_obra_setfreight").select("*").range(offset, offset + limit - 1).execute()
-        data = res.data
-        if not data: break
-        all_data.extend(data)
-        if len(data) < limit: break
-        offset += limit
+            df = fetch_table(
+                supabase,
+                table,
+                filters=period_filters(anio, mes, anio_texto=False)
+            )
 
-    return pd.DataFrame(all_data)
+        return filtrar_anio(df, anio)
 
-@st.cache_data
-def load_refacciones_logis():
-    supabase = get_supabase()
-    all_data, limit, offset = [], 1000, 0
+    with ThreadPoolExecutor(max_workers=len(tables)) as executor:
+        frames = list(executor.map(load, tables))
 
-    while True:
-        res = supabase.table("refacciones_data_logis").select("*").range(offset, offset + limit - 1).execute()
-        data = res.data
-        if not data: break
-        all_data.extend(data)
-        if len(data) < limit: break
-        offset += limit
+    return dict(zip(CompanyDataset._fields, frames))
 
-    return pd.DataFrame(all_data)
 
-@st.cache_data
-def load_ostes_logis():
-    supabase = get_supabase()
-    all_data, limit, offset = [], 1000, 0
+def load_company_dataset(empresa, anio=None, mes=None):
 
-    while True:
-        res = supabase.table("ostes_logis").select("*").range(offset, offset + limit - 1).execute()
-        data = res.data
-        if not data: break
-        all_data.extend(data)
-        if len(data) < limit: break
-        offset += limit
+    if empresa not in COMPANY_TABLES:
+        return CompanyDataset(pd.DataFrame(), pd.DataFrame(), pd.DataFrame())
 
-    return pd.DataFrame(all_data)
+    return CompanyDataset(**load_company_frames(empresa, anio, mes))
 
-@st.cache_data
-def load_mano_obra_logis():
+# distinct (anio, mes) pairs of one table for the consulta dropdowns;
+# cached per table name, so any write to that table refreshes it
+@cached_tables(ttl=REPORTES_LOOKUP_TTL, budget="reportes")
+def load_anio_mes_facets(table_name):
     supabase = get_supabase()
-    all_data, limit, offset = [], 1000, 0
-
-    while True:
-        res = supabase.table("mano_obra_logis").select("*").range(offset, offset + limit - 1).execute()
-        data = res.data
-        if not data: break
-        all_data.extend(data)
-        if len(data) < limit: break
-        offset += limit
 
-    return pd.DataFrame(all_data)
+    return anio_mes_facets(
+        supabase,
+        table_name,
+        fallback=lambda: sync_table(supabase, table_name)
+    )
 
 #Load Units my dude
-@st.cache_data
+@cached_tables("vehicle_units", ttl=REPORTES_LOOKUP_TTL, budget="reportes")
 def load_vehicle_units():
     try:
         supabase = get_supabase()
 
-        response = supabase.table("vehicle_units").select("*").execute()
+        response = (
+            supabase
+            .table("vehicle_units")
+            .select(select_columns("reportes_units"))
+            .execute()
+        )
         df = pd.DataFrame(response.data)
 
         if not df.empty:
@@ -409,12 +263,17 @@ def load_vehicle_units():
         return pd.DataFrame()
 
 #Loads Proveedores Iva
-@st.cache_data
+@cached_tables("proveedores_iva", ttl=REPORTES_LOOKUP_TTL, budget="reportes")
 def load_proveedores_iva():
     try:
         supabase = get_supabase()
 
-        response = supabase.table("proveedores_iva").select("*").execute()
+        response = (
+            supabase
+            .table("proveedores_iva")
+            .select(select_columns("reportes_proveedores_iva"))
+            .execute()
+        )
         df = pd.DataFrame(response.data)
 
         if not df.empty:
@@ -427,37 +286,16 @@ def load_proveedores_iva():
         return pd.DataFrame()
     
 #load refacciones
-@st.cache_data
+@cached_tables("parts", ttl=REPORTES_LOOKUP_TTL, budget="reportes")
 def load_parts():
     try:
         supabase = get_supabase()
 
-        all_data = []
-        limit = 1000
-        offset = 0
-
-        while True:
-            response = (
-                supabase
-                .table("parts")
-                .select("*")
-                .range(offset, offset + limit - 1)
-                .execute()
-            )
-
-            data = response.data
-
-            if not data:
-                break
-
-            all_data.extend(data)
-
-            if len(data) < limit:
-                break
-
-            offset += limit
-
-        df = pd.DataFrame(all_data)
+        df = fetch_table(
+            supabase,
+            "parts",
+            columns=select_columns("reportes_parts")
+        )
 
         if not df.empty:
             df.columns = df.columns.str.strip().str.lower()
@@ -468,6 +306,11 @@ def load_parts():
         st.error(f"Error cargando parts: {e}")
         return pd.DataFrame()
 
+# normalized parte -> tipo, rebuilt only when the parts catalog changes
+@cached_tables("parts", ttl=REPORTES_LOOKUP_TTL, budget="reportes")
+def load_parts_lookup():
+    return build_parts_lookup(load_parts())
+
 # =================================
 # MODE SELECTOR
 # =================================
@@ -555,14 +398,18 @@ if st.session_state.modo_reportes == "consultar":
             key="consulta_empresa"
         )
 
-    with col2:
-        temp_df = load_refacciones_igloo()
+    if empresa_consulta in COMPANY_TABLES:
+        facets = load_anio_mes_facets(
+            company_dataset_tables(empresa_consulta).refacciones
+        )
+    else:
+        facets = pd.DataFrame(columns=["anio", "mes", "total"])
 
-        if not temp_df.empty and "anio" in temp_df.columns:
-            temp_df["anio"] = pd.to_numeric(temp_df["anio"], errors="coerce")
-            years = sorted(temp_df["anio"].dropna().unique(), reverse=True)
-        else:
-            years = []
+    with col2:
+        years = sorted(
+            (int(y) for y in facets["anio"].dropna().unique()),
+            reverse=True
+        )
 
         year_options = ["Todos"] + list(years)
 
@@ -572,46 +419,26 @@ if st.session_state.modo_reportes == "consultar":
             key="consulta_year"
         )
     with col3:
-        if empresa_consulta == "IGLOO":
-            temp_df_mes = load_refacciones_igloo()
-        elif empresa_consulta == "LINCOLN FREIGHT":
-            temp_df_mes = load_refacciones_lincoln()
-        elif empresa_consulta == "PICUS":
-            temp_df_mes = load_refacciones_picus()
-        elif empresa_consulta == "SET FREIGHT INTERNATIONAL":
-            temp_df_mes = load_refacciones_setfreight()
-        elif empresa_consulta == "SET LOGIS PLUS":
-            temp_df_mes = load_refacciones_logis()
-        else:
-            temp_df_mes = pd.DataFrame()
-
         MONTH_ORDER = {
             "january": 1, "february": 2, "march": 3, "april": 4,
             "may": 5, "june": 6, "july": 7, "august": 8,
             "september": 9, "october": 10, "november": 11, "december": 12
         }
 
-        if not temp_df_mes.empty and "mes" in temp_df_mes.columns:
+        facets_mes = facets
 
-            meses_clean = (
-                temp_df_mes["mes"]
-                .dropna()
-                .astype(str)
-                .str.strip()
-                .str.lower()
-            )
-
-            meses_clean = meses_clean[meses_clean.isin(MONTH_ORDER.keys())]
+        if year_filter != "Todos":
+            facets_mes = facets_mes[facets_mes["anio"] == year_filter]
 
-            meses_sorted = sorted(
-                meses_clean.unique(),
-                key=lambda x: MONTH_ORDER[x]
-            )
+        meses_clean = facets_mes["mes"].dropna()
+        meses_clean = meses_clean[meses_clean.isin(MONTH_ORDER.keys())]
 
-            meses = [m.capitalize() for m in meses_sorted]
+        meses_sorted = sorted(
+            meses_clean.unique(),
+            key=lambda x: MONTH_ORDER[x]
+        )
 
-        else:
-            meses = []
+        meses = [m.capitalize() for m in meses_sorted]
 
         mes_options = ["Todos"] + meses
 
@@ -640,36 +467,22 @@ if st.session_state.modo_reportes == "consultar":
     # =================================
     # LOAD DATA
     # =================================
-    if empresa_consulta == "IGLOO":
-        df_ref = load_refacciones_igloo()
-        df_ost = load_ostes_igloo()
-        df_mo  = load_mano_obra_igloo()
-
-    elif empresa_consulta == "LINCOLN FREIGHT":
-        df_ref = load_refacciones_lincoln()
-        df_ost = load_ostes_lincoln()
-        df_mo  = load_mano_obra_lincoln()
-
-    elif empresa_consulta == "PICUS":
-        df_ref = load_refacciones_picus()
-        df_ost = load_ostes_picus()
-        df_mo  = load_mano_obra_picus()
-
-    elif empresa_consulta == "SET FREIGHT INTERNATIONAL":
-        df_ref = load_refacciones_setfreight()
-        df_ost = load_ostes_setfreight()
-        df_mo  = load_mano_obra_setfreight()
-
-    elif empresa_consulta == "SET LOGIS PLUS":
-        df_ref = load_refacciones_logis()
-        df_ost = load_ostes_logis()
-        df_mo  = load_mano_obra_logis()
+    dataset = load_company_dataset(
+        empresa_consulta,
+        anio=year_filter if year_filter != "Todos" else None,
+        mes=mes_filter_norm if mes_filter_norm != "Todos" else None
+    )
+
+    df_ref = dataset.refacciones
+    df_ost = dataset.ostes
+    df_mo  = dataset.mano_obra
 
     # -------------------------------
     # CLEAN COLUMNS
     # -------------------------------
     def clean(df):
-        df.columns = df.columns.str.strip().str.lower()
+        # a period with no rows comes back without columns
+        df.columns = df.columns.astype(str).str.strip().str.lower()
         return df
 
     df_ref = clean(df_ref)
@@ -704,22 +517,6 @@ if st.session_state.modo_reportes == "consultar":
         if "anio" in df.columns:
             df["anio"] = pd.to_numeric(df["anio"], errors="coerce")
 
-    # -------------------------------
-    # FILTER YEAR
-    # -------------------------------
-    if year_filter != "Todos":
-        df_ref = df_ref[df_ref["anio"] == year_filter]
-        df_ost = df_ost[df_ost["anio"] == year_filter]
-        df_mo  = df_mo[df_mo["anio"] == year_filter]
-
-    # -------------------------------
-    # FILTER MES
-    # -------------------------------
-    if mes_filter_norm != "Todos":
-        df_ref = df_ref[df_ref["mes"] == mes_filter_norm]
-        df_ost = df_ost[df_ost["mes"] == mes_filter_norm]
-        df_mo  = df_mo[df_mo["mes"] == mes_filter_norm]
-
     # -------------------------------
     # RENAME
     # -------------------------------
@@ -904,7 +701,7 @@ st.success(f"Empresa seleccionada: {empresa}")
 # =============================
 df_units = load_vehicle_units()
 df_proveedores_iva = load_proveedores_iva()
-df_parts = load_parts()
+parts_lookup = load_parts_lookup()
 
 empresa_code = EMPRESA_MAP.get(empresa)
 
@@ -1082,6 +879,8 @@ def upload_to_supabase(df, table_name):
         else:
             supabase.table(table_name).upsert(records, on_conflict="reporte").execute()
 
+        invalidate_tables(table_name)
+
         st.success(f"✅ {len(records)} registros insertados en {table_name}")
 
     except Exception as e:
@@ -1117,7 +916,7 @@ def read_file(file):
 # =================================
 # LOAD TC FROM SUPABASE
 # =================================
-@st.cache_data
+@cached_tables("tc_mensual", ttl=REPORTES_LOOKUP_TTL, budget="reportes")
 def load_tc():
     try:
         supabase = get_supabase()
@@ -1356,31 +1155,9 @@ if file_ordenes and file_mantenimientos:
             # =============================
             # PARTS MERGE (FORCED UNIQUE)
             # =============================
-            if df_parts is not None and not df_parts.empty:
-
-                import re
-                import unicodedata
-
-                def normalize_part_text(text):
-                    if pd.isna(text):
-                        return ""
-                    text = str(text).upper().strip()
-                    text = unicodedata.normalize("NFKD", text)
-                    text = "".join(c for c in text if not unicodedata.combining(c))
-                    text = re.sub(r"[^\w\s/]", "", text)
-                    text = re.sub(r"\s+", " ", text)
-                    return text.strip()
-
-                parts_lookup = (
-                    df_parts[["parte", "tipo"]]
-                    .dropna(subset=["parte"])
-                    .copy()
-                )
-
-                parts_lookup["parte"] = parts_lookup["parte"].apply(normalize_part_text)
-                parts_lookup = parts_lookup.drop_duplicates(subset=["parte"], keep="first")
+            if parts_lookup is not None and not parts_lookup.empty:
 
-                df_final_ref["Parte"] = df_final_ref["Parte"].apply(normalize_part_text)
+                df_final_ref["Parte"] = normalize_part_names(df_final_ref["Parte"])
 
                 df_final_ref = df_final_ref.merge(
                     parts_lookup,
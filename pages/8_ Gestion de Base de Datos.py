@@ -4,6 +4,9 @@ from supabase import create_client
 from auth import require_login, require_access
 from datetime import datetime, timezone
 from pages.css import load_css
+from supabase_loader import fetch_rows
+from table_cache import cached_tables, invalidate_tables
+from user_directory import user_by_id
 from io import BytesIO
 import numpy as np
 
@@ -164,7 +167,7 @@ if st.session_state.get("delete_modal"):
                     .eq("unidad", unidad) \
                     .execute()
 
-                st.cache_data.clear()
+                invalidate_tables("vehicle_units")
 
                 st.session_state.delete_modal = None
 
@@ -181,29 +184,10 @@ if st.session_state.get("delete_modal"):
 # =================================
 # Load Data
 # =================================
-@st.cache_data(ttl=60)
+@cached_tables(ttl=60)
 def load_table(table_name):
 
-    page_size = 1000
-    start = 0
-    all_rows = []
-
-    while True:
-        response = (
-            supabase
-            .table(table_name)
-            .select("*")
-            .range(start, start + page_size - 1)
-            .execute()
-        )
-
-        data = response.data
-
-        if not data:
-            break
-
-        all_rows.extend(data)
-        start += page_size
+    all_rows = fetch_rows(supabase, table_name)
 
     df = pd.DataFrame(all_rows)
 
@@ -221,16 +205,13 @@ def log_action(action, table_name, record_key, details):
 
     user_id = user["id"]
 
-    profile = (
-        supabase
-        .table("profiles")
-        .select("full_name")
-        .eq("id", user_id)
-        .single()
-        .execute()
-    )
+    profile = user_by_id(supabase, user_id)
 
-    full_name = profile.data["full_name"]
+    full_name = (
+        profile.get("full_name")
+        if profile
+        else user.get("name")
+    )
 
     supabase.table("audit_log").insert({
 
@@ -243,6 +224,8 @@ def log_action(action, table_name, record_key, details):
 
     }).execute()
 
+    invalidate_tables("audit_log")
+
 # =================================
 # Session state
 # =================================
@@ -430,7 +413,7 @@ with tab_unidades:
                         f"Agregó unidad {unidad}"
                     )
 
-                    st.cache_data.clear()
+                    invalidate_tables("vehicle_units")
 
                     st.success("Unidad agregada.")
 
@@ -581,7 +564,7 @@ with tab_unidades:
                         f"Modificó unidad {unidad}"
                     )
 
-                    st.cache_data.clear()
+                    invalidate_tables("vehicle_units")
 
                     st.success("Unidad actualizada.")
 
@@ -655,7 +638,7 @@ with tab_unidades:
                     f"Eliminó unidad {unidad}"
                 )
 
-                st.cache_data.clear()
+                invalidate_tables("vehicle_units")
 
                 st.success("Unidad eliminada correctamente.")
 
@@ -773,7 +756,7 @@ with tab_unidades:
                     f"Reemplazó completamente la tabla vehicle_units"
                 )
 
-                st.cache_data.clear()
+                invalidate_tables("vehicle_units")
 
                 st.success(
                     f"Se cargaron correctamente {len(records)} unidades."
@@ -875,7 +858,7 @@ with tab_refacciones:
                             f"Agregó refacción {parte.strip()}"
                         )
 
-                        st.cache_data.clear()
+                        invalidate_tables("parts")
                         st.success("Refacción agregada.")
                         st.rerun()
 
@@ -951,7 +934,7 @@ with tab_refacciones:
                                 f"Modificó refacción {parte.strip()}"
                             )
 
-                            st.cache_data.clear()
+                            invalidate_tables("parts")
 
                             st.success("Refacción actualizada.")
 
@@ -991,7 +974,7 @@ with tab_refacciones:
                     f"Eliminó refacción {selected}"
                 )
 
-                st.cache_data.clear()
+                invalidate_tables("parts")
                 st.success("Refacción eliminada.")
                 st.rerun()
 
@@ -1054,7 +1037,7 @@ with tab_refacciones:
                     "Reemplazó completamente la tabla parts"
                 )
 
-                st.cache_data.clear()
+                invalidate_tables("parts")
 
                 st.success("Tabla reemplazada correctamente.")
 
@@ -1178,7 +1161,7 @@ with tab_proveedores:
                         f"Agregó proveedor {proveedor.strip()}"
                     )
 
-                    st.cache_data.clear()
+                    invalidate_tables("proveedores_iva")
                     st.success("Proveedor agregado.")
                     st.rerun()
 
@@ -1278,7 +1261,7 @@ with tab_proveedores:
                             f"Modificó proveedor {proveedor.strip()}"
                         )
 
-                        st.cache_data.clear()
+                        invalidate_tables("proveedores_iva")
                         st.success("Proveedor actualizado.")
                         st.rerun()
 
@@ -1321,7 +1304,7 @@ with tab_proveedores:
                     f"Eliminó proveedor {selected}"
                 )
 
-                st.cache_data.clear()
+                invalidate_tables("proveedores_iva")
                 st.success("Proveedor eliminado.")
                 st.rerun()
 
@@ -1421,7 +1404,7 @@ with tab_proveedores:
                     "Reemplazó completamente la tabla proveedores_iva"
                 )
 
-                st.cache_data.clear()
+                invalidate_tables("proveedores_iva")
 
                 st.success(
                     f"Se cargaron {len(records)} proveedores."
@@ -1546,7 +1529,7 @@ with tab_tc:
                     f"Agregó TC {month} {year}"
                 )
 
-                st.cache_data.clear()
+                invalidate_tables("tc_mensual")
 
                 st.success("Registro agregado.")
 
@@ -1633,7 +1616,7 @@ with tab_tc:
                         f"Modificó TC {month} {year}"
                     )
 
-                    st.cache_data.clear()
+                    invalidate_tables("tc_mensual")
 
                     st.success("Registro actualizado.")
 
@@ -1693,7 +1676,7 @@ with tab_tc:
                     f"Eliminó TC {selected}"
                 )                
 
-                st.cache_data.clear()
+                invalidate_tables("tc_mensual")
 
                 st.success("Registro eliminado.")
 
@@ -1785,7 +1768,7 @@ with tab_tc:
                     "Reemplazó completamente la tabla tc_mensual"
                 )
 
-                st.cache_data.clear()
+                invalidate_tables("tc_mensual")
 
                 st.success(
                     f"Se cargaron {len(records)} registros."
@@ -2046,7 +2029,7 @@ with tab_directorio:
                                 f"Agregó entrada {dir_id} - {proveedor.strip()}",
                             )
 
-                            st.cache_data.clear()
+                            invalidate_tables("directorio_auxilio_carretero")
                             st.success("Entrada agregada correctamente.")
                             st.rerun()
 
@@ -2269,7 +2252,7 @@ with tab_directorio:
                                     f"Modificó entrada {dir_id} - {proveedor.strip()}",
                                 )
 
-                                st.cache_data.clear()
+                                invalidate_tables("directorio_auxilio_carretero")
                                 st.success("Entrada actualizada correctamente.")
                                 st.rerun()
 
@@ -2327,7 +2310,7 @@ with tab_directorio:
                             f"Eliminó entrada {row['id']} - {row['proveedor']}",
                         )
 
-                        st.cache_data.clear()
+                        invalidate_tables("directorio_auxilio_carretero")
                         st.success("Entrada eliminada correctamente.")
                         st.rerun()
 
@@ -2541,7 +2524,7 @@ with tab_directorio:
                             "directorio_auxilio_carretero",
                         )
 
-                        st.cache_data.clear()
+                        invalidate_tables("directorio_auxilio_carretero")
 
                         st.success(
                             f"Se cargaron correctamente "
@@ -2713,7 +2696,7 @@ with tab_directorio:
                             f"Agregó entrada 911: {contacto.strip()}",
                         )
 
-                        st.cache_data.clear()
+                        invalidate_tables("directorio_auxilio_carretero_911")
                         st.success("Entrada agregada correctamente.")
                         st.rerun()
 
@@ -2867,7 +2850,7 @@ with tab_directorio:
                                 f"Modificó entrada 911: {contacto.strip()}",
                             )
 
-                            st.cache_data.clear()
+                            invalidate_tables("directorio_auxilio_carretero_911")
                             st.success("Entrada actualizada correctamente.")
                             st.rerun()
 
@@ -2927,7 +2910,7 @@ with tab_directorio:
                         f"Eliminó entrada 911: {row['contacto']}",
                     )
 
-                    st.cache_data.clear()
+                    invalidate_tables("directorio_auxilio_carretero_911")
                     st.success("Entrada eliminada correctamente.")
                     st.rerun()
 
@@ -3065,7 +3048,7 @@ with tab_directorio:
                         "directorio_auxilio_carretero_911",
                     )
 
-                    st.cache_data.clear()
+                    invalidate_tables("directorio_auxilio_carretero_911")
 
                     st.success(
                         f"Se cargaron correctamente "
@@ -3228,6 +3211,9 @@ if is_admin:
                         .eq("id", row["id"]) \
                         .execute()
 
+                    # before log_action so the directory sees the new name
+                    invalidate_tables("profiles")
+
                     log_action(
                         "UPDATE",
                         "profiles",
@@ -3235,8 +3221,6 @@ if is_admin:
                         f"Actualizó usuario {row['email']}"
                     )
 
-                    st.cache_data.clear()
-
                     st.success("Usuario actualizado correctamente.")
 
                     st.rerun()
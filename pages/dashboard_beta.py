@@ -7,6 +7,10 @@ import json
 import streamlit.components.v1 as components
 from supabase import create_client
 from pages.css import load_css
+from activity_log import log_activity_event
+from supabase_loader import count_rows
+from table_cache import cached_tables
+from concurrent.futures import ThreadPoolExecutor
 
 # -------------------------------
 # Security gate
@@ -64,20 +68,15 @@ supabase = get_supabase()
 
 def log_activity(action, page):
 
-    try:
+    log_activity_event(supabase, {
 
-        supabase.table("user_activity_log").insert({
+        "user_id": user.get("id"),
+        "user_name": user.get("name"),
+        "login_counter": st.session_state.get("login_counter"),
+        "action": action,
+        "page": page,
 
-            "user_id": user.get("id"),
-            "user_name": user.get("name"),
-            "login_counter": st.session_state.get("login_counter"),
-            "action": action,
-            "page": page,
-
-        }).execute()
-
-    except Exception as e:
-        print(e)
+    })
 
 if not st.session_state.get("dashboard_loaded", False):
 
@@ -352,6 +351,41 @@ def render_dashboard_cards(buttons, columns_per_row=3):
             unsafe_allow_html=True
         )
 
+# =============================
+# KPI SERVICE
+# =============================
+# Every dashboard counter in one call: the counts run concurrently and
+# the result is cached per access set until one of the tables is written.
+ACCESS_TABLE_MAP = {
+    "igloo": "IGLOO",
+    "lincoln": "LINCOLN",
+    "picus": "PICUS",
+    "setlogis": "SLP",
+    "setfreight": "SFI",
+}
+
+@cached_tables(
+    "solicitud_viaje",
+    "bonos_operadores",
+    *ACCESS_TABLE_MAP.values(),
+    ttl=60
+)
+def cargar_kpis(pase_tables):
+
+    tablas = ["solicitud_viaje", "bonos_operadores", *pase_tables]
+
+    with ThreadPoolExecutor(max_workers=len(tablas)) as executor:
+        conteos = dict(zip(
+            tablas,
+            executor.map(lambda tabla: count_rows(supabase, tabla), tablas)
+        ))
+
+    return {
+        "viaticos": conteos["solicitud_viaje"],
+        "bonos": conteos["bonos_operadores"],
+        "pases": sum(conteos[tabla] for tabla in pase_tables),
+    }
+
 # =============================
 # MODULE CARDS
 # =============================
@@ -366,45 +400,17 @@ if show_kpis:
     # KPI TOTALS
     # =====================================================
 
-    total_viaticos = (
-        supabase.table("solicitud_viaje")
-        .select("*", count="exact", head=True)
-        .execute()
-        .count
-    )
-
-    total_bonos = (
-        supabase.table("bonos_operadores")
-        .select("*", count="exact", head=True)
-        .execute()
-        .count
-    )
-
-    ACCESS_TABLE_MAP = {
-        "igloo": "IGLOO",
-        "lincoln": "LINCOLN",
-        "picus": "PICUS",
-        "setlogis": "SLP",
-        "setfreight": "SFI",
-    }
-
-    pase_tables = [
+    pase_tables = tuple(
         tabla
         for permiso, tabla in ACCESS_TABLE_MAP.items()
         if permiso in access
-    ]
-
-    total_pases = 0
-
-    for table in pase_tables:
+    )
 
-        response = (
-            supabase.table(table)
-            .select("*", count="exact", head=True)
-            .execute()
-        )
+    kpis = cargar_kpis(pase_tables)
 
-        total_pases += response.count or 0
+    total_viaticos = kpis["viaticos"]
+    total_bonos = kpis["bonos"]
+    total_pases = kpis["pases"]
 
     # =====================================================
     # MODULES
@@ -0,0 +1,104 @@
+import sys
+import threading
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# =================================
+# PART NAME NORMALIZATION
+# =================================
+# Same result as the per-value normalize_part_text it replaces (upper,
+# strip, NFKD, drop combining marks, keep only word chars / spaces / "/",
+# collapse spaces), but done with pandas string ops over the distinct
+# values only. Results are memoized, so a value seen in an earlier build
+# (catalog or upload) is not normalized again.
+MAX_MEMO = 100_000
+
+_memo = {}
+_memo_lock = threading.Lock()
+_combining_marks = None
+
+
+def _combining_table():
+
+    global _combining_marks
+
+    if _combining_marks is None:
+        _combining_marks = {
+            code: None
+            for code in range(sys.maxunicode + 1)
+            if unicodedata.combining(chr(code))
+        }
+
+    return _combining_marks
+
+
+def _normalize_strings(values):
+
+    return (
+        pd.Series(values, dtype=object)
+        .str.upper()
+        .str.strip()
+        .str.normalize("NFKD")
+        .str.translate(_combining_table())
+        .str.replace(r"[^\w\s/]", "", regex=True)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+        .tolist()
+    )
+
+
+def normalize_part_names(values):
+
+    values = pd.Series(values)
+
+    # factorize the str() form: raw objects would fold 1, 1.0 and True
+    # together. NaN / None -> code -1 -> ""
+    strings = values.astype(object).map(str, na_action="ignore")
+    codes, uniques = pd.factorize(strings.where(values.notna()))
+    keys = list(uniques)
+
+    with _memo_lock:
+        missing = [key for key in dict.fromkeys(keys) if key not in _memo]
+
+    if missing:
+
+        normalized = dict(zip(missing, _normalize_strings(missing)))
+
+        with _memo_lock:
+
+            if len(_memo) + len(normalized) > MAX_MEMO:
+                _memo.clear()
+
+            _memo.update(normalized)
+
+    else:
+        normalized = {}
+
+    with _memo_lock:
+        mapped = np.array(
+            [normalized.get(key, _memo.get(key)) for key in keys] + [""],
+            dtype=object
+        )
+
+    # code -1 picks the trailing ""
+    return pd.Series(mapped[codes], index=values.index, dtype=object)
+
+# =================================
+# PARTS LOOKUP
+# =================================
+# parte -> tipo with normalized, unique part names (first one wins)
+def build_parts_lookup(df_parts):
+
+    if df_parts is None or df_parts.empty:
+        return pd.DataFrame(columns=["parte", "tipo"])
+
+    parts_lookup = (
+        df_parts[["parte", "tipo"]]
+        .dropna(subset=["parte"])
+        .copy()
+    )
+
+    parts_lookup["parte"] = normalize_part_names(parts_lookup["parte"])
+
+    return parts_lookup.drop_duplicates(subset=["parte"], keep="first")
@@ -0,0 +1,91 @@
+# =================================
+# SEARCH INDEX
+# =================================
+# Built once per data version, then every BUSCAR filter is a set lookup.
+# Substring columns map every 1..GRAM_SIZE character gram to the row
+# positions containing it: short queries are a direct lookup, longer ones
+# intersect their grams and confirm the candidates with a plain
+# substring check, so results match str.contains(regex=False).
+# Exact columns map each value to its row positions (== filters).
+GRAM_SIZE = 3
+
+
+def _normalize(value, case_sensitive):
+
+    return value if case_sensitive else value.lower()
+
+
+def build_search_index(df, substring_columns, exact_columns=()):
+
+    index = {
+        "size": len(df),
+        "substring": {},
+        "exact": {},
+    }
+
+    for column, case_sensitive in substring_columns.items():
+
+        if column in df.columns:
+            values = df[column].fillna("").astype(str).tolist()
+        else:
+            values = [""] * len(df)
+
+        values = [_normalize(v, case_sensitive) for v in values]
+
+        postings = {}
+
+        for pos, value in enumerate(values):
+            for n in range(1, GRAM_SIZE + 1):
+                for start in range(len(value) - n + 1):
+                    postings.setdefault(value[start:start + n], set()).add(pos)
+
+        index["substring"][column] = {
+            "case_sensitive": case_sensitive,
+            "values": values,
+            "postings": postings,
+        }
+
+    for column in exact_columns:
+
+        postings = {}
+
+        if column in df.columns:
+            for pos, value in enumerate(df[column].tolist()):
+                postings.setdefault(value, set()).add(pos)
+
+        index["exact"][column] = postings
+
+    return index
+
+# =================================
+# LOOKUPS
+# =================================
+def search_substring(index, column, query):
+
+    entry = index["substring"][column]
+    query = _normalize(str(query), entry["case_sensitive"])
+    postings = entry["postings"]
+
+    if query == "":
+        return set(range(index["size"]))
+
+    if len(query) <= GRAM_SIZE:
+        return set(postings.get(query, ()))
+
+    grams = sorted(
+        (
+            postings.get(query[start:start + GRAM_SIZE], set())
+            for start in range(len(query) - GRAM_SIZE + 1)
+        ),
+        key=len
+    )
+
+    candidates = set(grams[0]).intersection(*grams[1:])
+    values = entry["values"]
+
+    return {pos for pos in candidates if query in values[pos]}
+
+
+def search_exact(index, column, value):
+
+    return set(index["exact"].get(column, {}).get(value, ()))
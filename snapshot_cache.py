@@ -0,0 +1,181 @@
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import time
+from pathlib import Path
+import pandas as pd
+
+# =================================
+# SNAPSHOT CONFIG
+# =================================
+# Optional: needs pyarrow for Parquet. Set SNAPSHOT_DIR="" to disable.
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv(
+    "SNAPSHOT_DIR",
+    str(Path(__file__).parent / ".snapshots")
+)
+
+SNAPSHOT_MAX_AGE = 24 * 3600
+
+
+def snapshots_enabled():
+    return PARQUET_AVAILABLE and bool(SNAPSHOT_DIR)
+
+# =================================
+# JSON COLUMNS
+# =================================
+# Parquet would turn JSON lists into numpy arrays (and cannot store
+# mixed-type columns), so every object column that is not plain text is
+# written as JSON strings and listed in the meta file for load.
+def _json_columns(df):
+
+    columns = []
+
+    for column in df.columns:
+
+        if df[column].dtype != object:
+            continue
+
+        values = df[column].dropna()
+
+        if not values.map(lambda v: isinstance(v, str)).all():
+            columns.append(column)
+
+    return columns
+
+
+def _is_missing(value):
+
+    return value is None or value is pd.NA or (
+        isinstance(value, float) and value != value
+    )
+
+
+def _encode_json(df, columns):
+
+    if not columns:
+        return df
+
+    df = df.copy()
+
+    for column in columns:
+        df[column] = df[column].map(
+            lambda v: None if _is_missing(v) else json.dumps(v)
+        )
+
+    return df
+
+
+def _decode_json(df, columns):
+
+    for column in columns:
+        df[column] = df[column].map(
+            lambda v: json.loads(v) if isinstance(v, str) else None
+        ).astype(object)
+
+    return df
+
+
+def _snapshot_paths(table_name, key):
+
+    digest = hashlib.md5(repr(key).encode("utf-8")).hexdigest()[:12]
+    base = Path(SNAPSHOT_DIR) / f"{table_name}__{digest}"
+
+    return base.with_suffix(".parquet"), base.with_suffix(".json")
+
+# =================================
+# LOAD / SAVE
+# =================================
+# load_snapshot returns (frame, full_sync_at): the wall-clock time of the
+# last full read the snapshot descends from, so a restarted process does
+# not treat day-old data as a fresh full sync.
+def load_snapshot(table_name, key):
+
+    if not snapshots_enabled():
+        return None
+
+    data_path, meta_path = _snapshot_paths(table_name, key)
+
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        # older snapshots stored JSON columns as Parquet lists
+        if meta.get("key") != repr(key) or "json_columns" not in meta:
+            return None
+
+        if time.time() - meta.get("saved_at", 0) > SNAPSHOT_MAX_AGE:
+            return None
+
+        full_sync_at = meta.get("full_sync_at", meta.get("saved_at", 0))
+
+        df = _decode_json(
+            pd.read_parquet(data_path),
+            meta.get("json_columns", [])
+        )
+
+        return df, full_sync_at
+
+    except FileNotFoundError:
+        return None
+
+    except Exception as e:
+        logger.warning("Snapshot %s not loaded: %s", table_name, e)
+        return None
+
+
+def save_snapshot(table_name, key, df, full_sync_at=None):
+
+    if not snapshots_enabled():
+        return
+
+    data_path, meta_path = _snapshot_paths(table_name, key)
+
+    try:
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # write to temp files first so readers never see half a snapshot
+        tmp_data = data_path.with_suffix(".parquet.tmp")
+        tmp_meta = meta_path.with_suffix(".json.tmp")
+
+        json_columns = _json_columns(df)
+
+        _encode_json(df, json_columns).to_parquet(tmp_data, index=False)
+
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({
+                "table": table_name,
+                "key": repr(key),
+                "rows": len(df),
+                "json_columns": json_columns,
+                "saved_at": time.time(),
+                "full_sync_at": full_sync_at or time.time(),
+            }, f)
+
+        os.replace(tmp_data, data_path)
+        os.replace(tmp_meta, meta_path)
+
+    except Exception as e:
+        logger.warning("Snapshot %s not saved: %s", table_name, e)
+
+
+def drop_snapshots(table_name):
+
+    if not snapshots_enabled():
+        return
+
+    folder = Path(SNAPSHOT_DIR)
+
+    if not folder.exists():
+        return
+
+    for path in folder.glob(f"{table_name}__*"):
+        try:
+            path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,34 @@
+-- =================================
+-- YEAR / MONTH FACETS
+-- =================================
+-- Distinct (anio, mes) pairs with row counts for one Reportes table, so
+-- the consulta dropdowns are filled without reading the table.
+
+create or replace function anio_mes_facets(
+    p_table text
+)
+returns table (anio integer, mes text, total bigint)
+language plpgsql
+stable
+as $$
+begin
+
+    if p_table !~ '^(refacciones_data|ostes|mano_obra)_(igloo|lincoln|picus|setfreight|logis)$' then
+        raise exception 'Unknown report table %', p_table;
+    end if;
+
+    return query execute format(
+        'select
+             case
+                 when trim(anio::text) ~ ''^[0-9]+(\.0+)?$''
+                 then trim(anio::text)::numeric::integer
+             end as anio,
+             nullif(lower(trim(mes::text)), '''') as mes,
+             count(*) as total
+           from %I
+          group by 1, 2',
+        p_table
+    );
+
+end;
+$$;
@@ -0,0 +1,24 @@
+-- =================================
+-- EMAIL LOG
+-- =================================
+-- One row per message handled by email_queue: final status after the
+-- retries, number of attempts and the last error, if any.
+
+create table if not exists email_log (
+    id bigint generated always as identity primary key,
+    referencia text,
+    asunto text,
+    destinatarios jsonb not null default '[]'::jsonb,
+    estatus text not null check (estatus in ('Enviado', 'Fallido')),
+    intentos integer not null,
+    error text,
+    fecha timestamptz not null default now(),
+    created_at timestamptz not null default now()
+);
+
+create index if not exists email_log_referencia_idx
+    on email_log (referencia);
+
+create index if not exists email_log_fallidos_idx
+    on email_log (fecha desc)
+    where estatus = 'Fallido';
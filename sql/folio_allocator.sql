@@ -0,0 +1,84 @@
+-- =================================
+-- FOLIO ALLOCATOR
+-- =================================
+-- One counter row per folio prefix. insert_pase_with_folio() takes the
+-- next number and inserts the pase in the same transaction, so two
+-- concurrent captures can never get the same folio.
+
+create table if not exists folio_counters (
+    prefix text primary key,
+    last_value integer not null
+);
+
+create or replace function insert_pase_with_folio(
+    p_table text,
+    p_prefix text,
+    p_payload jsonb
+)
+returns text
+language plpgsql
+as $$
+declare
+    v_num integer;
+    v_folio text;
+    v_payload jsonb;
+    v_columns text;
+begin
+
+    if p_table not in ('IGLOO', 'LINCOLN', 'PICUS', 'SFI', 'SLP') then
+        raise exception 'Unknown pase table %', p_table;
+    end if;
+
+    -- first use of a prefix: seed from the highest folio already stored
+    if not exists (select 1 from folio_counters where prefix = p_prefix) then
+        execute format(
+            'select coalesce(max(substring("No. de Folio" from %s)::integer), 0)
+               from %I
+              where "No. de Folio" ~ %L',
+            length(p_prefix) + 1,
+            p_table,
+            '^' || p_prefix || '[0-9]+$'
+        ) into v_num;
+
+        insert into folio_counters (prefix, last_value)
+        values (p_prefix, v_num)
+        on conflict (prefix) do nothing;
+    end if;
+
+    update folio_counters
+       set last_value = last_value + 1
+     where prefix = p_prefix
+    returning last_value into v_num;
+
+    v_folio := p_prefix || lpad(v_num::text, 5, '0');
+    v_payload := p_payload || jsonb_build_object('No. de Folio', v_folio);
+
+    -- only the keys sent, so column defaults (id, timestamps) still apply
+    select string_agg(quote_ident(key), ', ')
+      into v_columns
+      from jsonb_object_keys(v_payload) as key;
+
+    execute format(
+        'insert into %I (%s) select %s from jsonb_populate_record(null::%I, $1)',
+        p_table,
+        v_columns,
+        v_columns,
+        p_table
+    ) using v_payload;
+
+    return v_folio;
+
+end;
+$$;
+
+-- =================================
+-- ONE PASE PER FOLIO
+-- =================================
+-- Lets the local fallback in folio_allocator.py detect a folio taken by
+-- another process (23505) and retry. Fails if a table already holds
+-- duplicate folios; those pases have to be renumbered first.
+create unique index if not exists igloo_no_de_folio_key on "IGLOO" ("No. de Folio");
+create unique index if not exists lincoln_no_de_folio_key on "LINCOLN" ("No. de Folio");
+create unique index if not exists picus_no_de_folio_key on "PICUS" ("No. de Folio");
+create unique index if not exists sfi_no_de_folio_key on "SFI" ("No. de Folio");
+create unique index if not exists slp_no_de_folio_key on "SLP" ("No. de Folio");
@@ -0,0 +1,33 @@
+-- =================================
+-- GROUPED COUNTS
+-- =================================
+-- (category, total) for one text column, blanks and "nan"/"none"/"null"
+-- placeholders left out, so distribution charts never pull the column.
+
+create or replace function grouped_counts(
+    p_table text,
+    p_column text
+)
+returns table (category text, total bigint)
+language plpgsql
+stable
+as $$
+begin
+
+    if p_table not in ('SERVICES', 'IGLOO', 'LINCOLN', 'PICUS', 'SFI', 'SLP') then
+        raise exception 'Unknown table %', p_table;
+    end if;
+
+    return query execute format(
+        'select trim(%1$I::text) as category, count(*) as total
+           from %2$I
+          where nullif(trim(%1$I::text), '''') is not null
+            and lower(trim(%1$I::text)) not in (''nan'', ''none'', ''null'')
+          group by 1
+          order by 2 desc',
+        p_column,
+        p_table
+    );
+
+end;
+$$;
@@ -0,0 +1,36 @@
+-- =================================
+-- INVOICES: ONE ROW PER FOLIO
+-- =================================
+-- guardar_facturas upserts on "No. de Folio", which needs a unique
+-- constraint on that column. Rows are never deleted here: if the old
+-- select/insert path left duplicate folios, the migration stops and
+-- lists them so the right invoice can be kept by hand.
+
+begin;
+
+do $$
+declare
+    v_duplicates text;
+begin
+
+    select string_agg(format('%s (%s rows)', folio, total), ', ' order by folio)
+      into v_duplicates
+      from (
+          select "No. de Folio" as folio, count(*) as total
+            from "INVOICES"
+           group by "No. de Folio"
+          having count(*) > 1
+      ) d;
+
+    if v_duplicates is not null then
+        raise exception 'Duplicate INVOICES folios: %', v_duplicates
+            using hint = 'Keep one row per folio, then run this migration again.';
+    end if;
+
+end;
+$$;
+
+alter table "INVOICES"
+    add constraint invoices_no_de_folio_key unique ("No. de Folio");
+
+commit;
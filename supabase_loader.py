@@ -0,0 +1,645 @@
+import threading
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from snapshot_cache import load_snapshot, save_snapshot, drop_snapshots
+
+# =================================
+# PAGINATION CONFIG
+# =================================
+PAGE_SIZE = 1000
+MAX_WORKERS = 6
+
+# Pages are OFFSET slices, so every page is ordered by the key column as
+# well: without a total order Postgres may return rows in a different
+# order per query and pages would overlap or skip rows. Tables without
+# that column are remembered and read one page after another.
+KEY_COLUMN = "id"
+
+_keyless_tables = set()
+
+# =================================
+# QUERY HELPERS
+# =================================
+# filters are (method, column, value) tuples, e.g. ("gte", "created_at", "2025-01-01")
+def apply_filters(query, filters=None):
+
+    for method, column, value in filters or []:
+        query = getattr(query, method)(column, value)
+
+    return query
+
+# =================================
+# ROW COUNT
+# =================================
+def count_rows(supabase, table_name, filters=None):
+
+    query = (
+        supabase
+        .table(table_name)
+        .select("*", count="exact", head=True)
+    )
+
+    response = apply_filters(query, filters).execute()
+
+    return response.count or 0
+
+# =================================
+# COLUMN PROJECTIONS
+# =================================
+# Columns each view actually reads. Loaders build their select() from
+# here instead of "*"; exports that hand the whole row to the user ask
+# for FULL_ROW explicitly.
+FULL_ROW = "*"
+
+VIEW_COLUMNS = {
+    # Autorizacion: KPIs, cards, BUSCAR/REPORTES and the pase modal
+    "pases_taller": [
+        "No. de Folio",
+        "Fecha de Captura",
+        "Empresa",
+        "Estado",
+        "Capturo",
+        "Tipo de Proveedor",
+        "Proveedor",
+        "Razones",
+        "Oste",
+        "No. de Reporte",
+        "No. de Unidad",
+        "Tipo de Unidad",
+        "Sucursal",
+        "Descripcion Problema",
+    ],
+    # Autorizacion: factura per folio
+    "facturas": [
+        "No. de Folio",
+        "No. de Factura",
+    ],
+    # Preparacion de Reportes: unit lookups
+    "reportes_units": [
+        "empresa",
+        "unidad",
+        "marca",
+        "modelo",
+        "vin",
+        "tipo_unidad",
+        "sucursal",
+        "estado",
+    ],
+    # Preparacion de Reportes: part type lookup
+    "reportes_parts": [
+        "parte",
+        "tipo",
+    ],
+    # Preparacion de Reportes: supplier name and IVA lookups
+    "reportes_proveedores_iva": [
+        "clave",
+        "proveedor",
+        "iva_pct",
+    ],
+}
+
+
+def _quote_column(column):
+
+    if column.isidentifier() and column == column.lower():
+        return column
+
+    return f'"{column}"'
+
+
+def select_columns(view, full=False):
+
+    if full:
+        return FULL_ROW
+
+    return ", ".join(
+        _quote_column(column)
+        for column in VIEW_COLUMNS[view]
+    )
+
+# =================================
+# PAGE FETCH
+# =================================
+def fetch_page(
+    supabase,
+    table_name,
+    start,
+    columns="*",
+    page_size=PAGE_SIZE,
+    order_by=None,
+    desc=False,
+    filters=None,
+    key_column=None
+):
+
+    query = (
+        supabase
+        .table(table_name)
+        .select(columns)
+    )
+
+    query = apply_filters(query, filters)
+
+    # chained calls append to one order param: created_at.asc,id.asc
+    for column in dict.fromkeys([order_by, key_column]):
+        if column:
+            query = query.order(column, desc=desc)
+
+    response = (
+        query
+        .range(start, start + page_size - 1)
+        .execute()
+    )
+
+    return response.data or []
+
+# =================================
+# PARALLEL PAGINATED LOAD
+# =================================
+def fetch_rows(
+    supabase,
+    table_name,
+    columns="*",
+    page_size=PAGE_SIZE,
+    max_workers=MAX_WORKERS,
+    order_by=None,
+    desc=False,
+    filters=None,
+    key_column=KEY_COLUMN
+):
+
+    if table_name in _keyless_tables:
+        key_column = None
+
+    # no total order: parallel pages could overlap, read them in sequence
+    if not key_column and not order_by:
+        max_workers = 1
+
+    total = count_rows(supabase, table_name, filters)
+
+    if total == 0:
+        return []
+
+    starts = list(range(0, total, page_size))
+
+    def load(start):
+        return fetch_page(
+            supabase,
+            table_name,
+            start,
+            columns=columns,
+            page_size=page_size,
+            order_by=order_by,
+            desc=desc,
+            filters=filters,
+            key_column=key_column
+        )
+
+    try:
+        if len(starts) == 1 or max_workers == 1:
+            pages = [load(start) for start in starts]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(max_workers, len(starts))
+            ) as executor:
+                pages = list(executor.map(load, starts))
+
+    except Exception as e:
+
+        # 42703: undefined column, the table has no key column
+        if not key_column or getattr(e, "code", None) != "42703":
+            raise
+
+        _keyless_tables.add(table_name)
+
+        return fetch_rows(
+            supabase,
+            table_name,
+            columns=columns,
+            page_size=page_size,
+            max_workers=max_workers,
+            order_by=order_by,
+            desc=desc,
+            filters=filters,
+            key_column=None
+        )
+
+    all_rows = []
+
+    for data in pages:
+        all_rows.extend(data)
+
+    # rows inserted after the count keep the last page full
+    start = starts[-1] + page_size
+
+    while pages[-1] and len(pages[-1]) == page_size:
+        pages.append(load(start))
+        all_rows.extend(pages[-1])
+        start += page_size
+
+    return all_rows
+
+
+def fetch_table(
+    supabase,
+    table_name,
+    columns="*",
+    page_size=PAGE_SIZE,
+    max_workers=MAX_WORKERS,
+    order_by=None,
+    desc=False,
+    filters=None,
+    key_column=KEY_COLUMN
+):
+
+    all_rows = fetch_rows(
+        supabase,
+        table_name,
+        columns=columns,
+        page_size=page_size,
+        max_workers=max_workers,
+        order_by=order_by,
+        desc=desc,
+        filters=filters,
+        key_column=key_column
+    )
+
+    return pd.DataFrame(all_rows)
+
+# =================================
+# KEYSET PAGINATION
+# =================================
+# Pages ordered by (sort_column desc nulls last, tie_column desc). The
+# cursor is the (sort, tie) pair of the last row shown, so every page is
+# one indexed range read no matter how deep it is.
+def _quote_value(value):
+
+    return '"' + str(value).replace('"', '\\"') + '"'
+
+
+def keyset_condition(sort_column, tie_column, cursor):
+
+    sort_value, tie_value = cursor
+
+    sort_col = _quote_column(sort_column)
+    tie = f"{_quote_column(tie_column)}.lt.{_quote_value(tie_value)}"
+
+    if sort_value is None:
+        return f"and({sort_col}.is.null,{tie})"
+
+    return ",".join([
+        f"{sort_col}.lt.{_quote_value(sort_value)}",
+        f"{sort_col}.is.null",
+        f"and({sort_col}.eq.{_quote_value(sort_value)},{tie})",
+    ])
+
+
+def fetch_keyset_page(
+    supabase,
+    table_name,
+    sort_column,
+    tie_column,
+    cursor=None,
+    columns="*",
+    page_size=PAGE_SIZE,
+    filters=None
+):
+
+    query = (
+        supabase
+        .table(table_name)
+        .select(columns)
+    )
+
+    query = apply_filters(query, filters)
+
+    if cursor is not None:
+        query = query.or_(keyset_condition(sort_column, tie_column, cursor))
+
+    # nullsfirst=False sends .nullslast, which keyset_condition relies on
+    response = (
+        query
+        .order(_quote_column(sort_column), desc=True, nullsfirst=False)
+        .order(_quote_column(tie_column), desc=True)
+        .limit(page_size)
+        .execute()
+    )
+
+    return response.data or []
+
+# =================================
+# GROUPED COUNTS
+# =================================
+# (category, count) from the grouped_counts RPC (sql/grouped_counts.sql)
+# instead of transferring the whole column. Until the function is
+# deployed, fallback() returns a frame the caller already holds and the
+# counts are computed from it.
+GROUPED_COUNTS_RPC = "grouped_counts"
+
+_missing_rpcs = set()
+
+
+# None when the function is not deployed (PGRST202), rows otherwise
+def _rpc_rows(supabase, name, params):
+
+    if name in _missing_rpcs:
+        return None
+
+    try:
+        response = supabase.rpc(name, params).execute()
+
+    except Exception as e:
+
+        if getattr(e, "code", None) != "PGRST202":
+            raise
+
+        _missing_rpcs.add(name)
+        return None
+
+    return response.data or []
+
+
+def count_values(series):
+
+    values = series.fillna("").astype(str).str.strip()
+
+    values = values[
+        (values != "")
+        & ~values.str.lower().isin(["nan", "none", "null"])
+    ]
+
+    return values.value_counts()
+
+
+def grouped_counts(supabase, table_name, column, fallback=None):
+
+    rows = _rpc_rows(supabase, GROUPED_COUNTS_RPC, {
+        "p_table": table_name,
+        "p_column": column,
+    })
+
+    if rows is not None:
+        return (
+            pd.Series(
+                [row["total"] for row in rows],
+                index=[row["category"] for row in rows],
+                dtype="int64",
+                name="count"
+            )
+            .sort_values(ascending=False, kind="stable")
+        )
+
+    df = fallback() if fallback else None
+
+    if df is None or column not in df.columns:
+        return pd.Series(dtype="int64", name="count")
+
+    return count_values(df[column])
+
+# =================================
+# YEAR / MONTH FACETS
+# =================================
+# Distinct (anio, mes) pairs with row counts from the anio_mes_facets RPC
+# (sql/anio_mes_facets.sql), so year/month dropdowns never pull the
+# table. mes comes back stripped and lower-cased; same fallback as above.
+ANIO_MES_FACETS_RPC = "anio_mes_facets"
+
+FACET_COLUMNS = ["anio", "mes", "total"]
+
+
+def anio_mes_facets(supabase, table_name, fallback=None):
+
+    rows = _rpc_rows(supabase, ANIO_MES_FACETS_RPC, {
+        "p_table": table_name,
+    })
+
+    if rows is None:
+
+        df = fallback() if fallback else None
+
+        if df is None or df.empty:
+            return pd.DataFrame(columns=FACET_COLUMNS)
+
+        df = df.rename(columns=lambda c: str(c).strip().lower())
+
+        facets = pd.DataFrame({
+            "anio": pd.to_numeric(df.get("anio"), errors="coerce"),
+            "mes": (
+                df["mes"].astype("string").str.strip().str.lower()
+                if "mes" in df.columns
+                else pd.Series(pd.NA, index=df.index, dtype="string")
+            ),
+        })
+
+        rows = (
+            facets
+            .groupby(["anio", "mes"], dropna=False)
+            .size()
+            .reset_index(name="total")
+            .to_dict(orient="records")
+        )
+
+    facets = pd.DataFrame(rows, columns=FACET_COLUMNS)
+    facets["anio"] = pd.to_numeric(facets["anio"], errors="coerce").astype("Int64")
+
+    return facets
+
+# =================================
+# DELTA SYNC
+# =================================
+# Keeps the last materialized frame per table and only pulls rows
+# newer than the high-water mark. Inserts are picked up by the delta,
+# edits and deletes need reset_sync() or the periodic full resync.
+# Frames are also written to disk snapshots so a restarted process
+# starts from the snapshot and only syncs the delta.
+FULL_SYNC_INTERVAL = 600
+
+_sync_state = {}
+_sync_locks = {}
+_sync_locks_guard = threading.Lock()
+
+
+def _sync_lock(key):
+
+    with _sync_locks_guard:
+        return _sync_locks.setdefault(key, threading.Lock())
+
+
+def _high_water_mark(df, watermark):
+
+    if df.empty or watermark not in df.columns:
+        return None
+
+    values = df[watermark].dropna()
+
+    if values.empty:
+        return None
+
+    if pd.api.types.is_numeric_dtype(values):
+        return values.max()
+
+    parsed = pd.to_datetime(values, errors="coerce", utc=True).dropna()
+
+    if parsed.empty:
+        return None
+
+    return parsed.max().isoformat()
+
+
+def _sort_frame(df, order_by, desc):
+
+    if not order_by or order_by not in df.columns:
+        return df.reset_index(drop=True)
+
+    if pd.api.types.is_numeric_dtype(df[order_by]):
+        sort_key = None
+    else:
+        sort_key = lambda col: pd.to_datetime(col, errors="coerce", utc=True)
+
+    return (
+        df
+        .sort_values(order_by, ascending=not desc, key=sort_key, kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+def sync_table(
+    supabase,
+    table_name,
+    columns="*",
+    watermark="created_at",
+    key_column="id",
+    order_by=None,
+    desc=False,
+    full_sync_interval=FULL_SYNC_INTERVAL
+):
+
+    key = (table_name, columns, watermark)
+
+    with _sync_lock(key):
+
+        state = _sync_state.get(key)
+        now = time.monotonic()
+
+        if state is None:
+
+            snapshot = load_snapshot(table_name, key)
+
+            if snapshot is not None:
+
+                snapshot_df, full_sync_at = snapshot
+
+                # full_at is monotonic; age the snapshot by its wall-clock time
+                state = {
+                    "df": snapshot_df,
+                    "mark": _high_water_mark(snapshot_df, watermark),
+                    "full_at": now - max(0, time.time() - full_sync_at),
+                }
+
+        needs_full = (
+            state is None
+            or state["mark"] is None
+            or now - state["full_at"] >= full_sync_interval
+        )
+
+        if needs_full:
+
+            df = fetch_table(
+                supabase,
+                table_name,
+                columns=columns,
+                order_by=order_by,
+                desc=desc,
+                key_column=key_column
+            )
+
+            full_at = now
+            changed = True
+
+        else:
+
+            # gte + dedupe on key so rows sharing the mark are not lost
+            use_key = key_column in state["df"].columns
+
+            new_rows = fetch_rows(
+                supabase,
+                table_name,
+                columns=columns,
+                order_by=watermark,
+                key_column=key_column,
+                filters=[(
+                    "gte" if use_key else "gt",
+                    watermark,
+                    state["mark"]
+                )]
+            )
+
+            df = state["df"]
+
+            if new_rows:
+
+                df = pd.concat(
+                    [df, pd.DataFrame(new_rows)],
+                    ignore_index=True
+                )
+
+                if use_key:
+                    df = df.drop_duplicates(subset=key_column, keep="last")
+
+                df = _sort_frame(df, order_by, desc)
+
+            full_at = state["full_at"]
+            changed = len(df) != len(state["df"])
+
+        mark = _high_water_mark(df, watermark)
+
+        _sync_state[key] = {
+            "df": df,
+            "mark": mark,
+            "full_at": full_at,
+            "bytes": (
+                int(df.memory_usage(deep=True).sum())
+                if changed or "bytes" not in state
+                else state["bytes"]
+            ),
+        }
+
+        # without a mark a snapshot could never be delta-synced
+        if changed and mark is not None:
+            save_snapshot(
+                table_name,
+                key,
+                df,
+                full_sync_at=time.time() - (now - full_at)
+            )
+
+        return df.copy()
+
+
+# memory held by the synced frames of a table (for cache budgets)
+def sync_state_bytes(table_name):
+
+    with _sync_locks_guard:
+        return sum(
+            state.get("bytes", 0)
+            for key, state in list(_sync_state.items())
+            if key[0] == table_name
+        )
+
+
+# drops the in-memory frames only; the next sync starts from the snapshot
+def release_sync(table_name):
+
+    with _sync_locks_guard:
+        keys = [key for key in _sync_state if key[0] == table_name]
+
+    for key in keys:
+        with _sync_lock(key):
+            _sync_state.pop(key, None)
+
+
+def reset_sync(table_name):
+
+    release_sync(table_name)
+    drop_snapshots(table_name)
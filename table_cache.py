@@ -0,0 +1,242 @@
+import copy
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+import streamlit as st
+from supabase_loader import reset_sync, release_sync, sync_state_bytes
+
+# =================================
+# TABLE WRITE VERSIONS
+# =================================
+# Process-wide counters shared by every page and session. Write helpers
+# bump the tables they touch; cached loaders take the version as an
+# argument so st.cache_data only misses after a real write.
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def bump_version(*table_names):
+
+    with _versions_lock:
+        for table_name in table_names:
+            _versions[table_name] = _versions.get(table_name, 0) + 1
+
+
+def table_version(*table_names):
+
+    with _versions_lock:
+        return tuple(
+            _versions.get(table_name, 0)
+            for table_name in table_names
+        )
+
+# =================================
+# TABLE SCOPED INVALIDATION
+# =================================
+# Replaces st.cache_data.clear(): only loaders that declared one of
+# these tables miss on their next call, every other cache stays warm.
+def invalidate_tables(*table_names):
+
+    bump_version(*table_names)
+
+    for table_name in table_names:
+        reset_sync(table_name)
+
+# =================================
+# BYTE-BUDGETED STORE
+# =================================
+# In-process LRU for loaders that hold whole tables. Every budget group
+# (e.g. "reportes") shares CACHE_BUDGET_BYTES; the least recently used
+# entries are evicted past it. The in-memory sync state of the entries'
+# tables is charged too (once per table) and released when no entry of
+# the group uses the table any more; the disk snapshot stays, so a
+# reload only pulls the delta.
+CACHE_BUDGET_BYTES = int(os.getenv("CACHE_BUDGET_MB", "512")) * 1024 * 1024
+
+_budget_store = OrderedDict()
+_budget_lock = threading.Lock()
+
+
+def _value_bytes(value):
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum())
+
+    if isinstance(value, dict):
+        return sum(_value_bytes(v) for v in value.values())
+
+    if isinstance(value, (list, tuple)):
+        return sum(_value_bytes(v) for v in value)
+
+    return sys.getsizeof(value)
+
+
+def _group_tables(group):
+
+    return {
+        table_name
+        for entry in _budget_store.values()
+        if entry["group"] == group
+        for table_name in entry["tables"]
+    }
+
+
+def _budget_evict(group):
+
+    sync_bytes = {
+        table_name: sync_state_bytes(table_name)
+        for table_name in _group_tables(group)
+    }
+
+    used = sum(sync_bytes.values()) + sum(
+        entry["bytes"]
+        for entry in _budget_store.values()
+        if entry["group"] == group
+    )
+
+    released = set()
+
+    for key in list(_budget_store):
+
+        if used <= CACHE_BUDGET_BYTES:
+            break
+
+        entry = _budget_store[key]
+
+        if entry["group"] != group:
+            continue
+
+        del _budget_store[key]
+        used -= entry["bytes"]
+
+        # only tables no other entry of the group still reads from
+        unused = set(entry["tables"]) - _group_tables(group) - released
+
+        for table_name in unused:
+            used -= sync_bytes.get(table_name, 0)
+
+        released.update(unused)
+
+    return released
+
+
+def _entry_tables(table_names, tables_of, args):
+
+    if tables_of is not None:
+        return tuple(tables_of(*args[:1]))
+
+    return table_names or args[:1]
+
+
+def _budget_cached(func, table_names, tables_of, ttl, group):
+
+    func_id = (func.__code__.co_filename, func.__qualname__)
+
+    @functools.wraps(func)
+    def loader(*args, **kwargs):
+
+        tables = _entry_tables(table_names, tables_of, args)
+        version = table_version(*tables)
+        key = (func_id, args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+
+        with _budget_lock:
+
+            entry = _budget_store.get(key)
+
+            if (
+                entry is not None
+                and entry["version"] == version
+                and (entry["expires_at"] is None or now < entry["expires_at"])
+            ):
+                _budget_store.move_to_end(key)
+                return copy.deepcopy(entry["value"])
+
+            _budget_store.pop(key, None)
+
+        value = func(*args, **kwargs)
+
+        # failed loads (None) are not cached
+        if value is None:
+            return value
+
+        with _budget_lock:
+
+            _budget_store[key] = {
+                "group": group,
+                "version": version,
+                "expires_at": now + ttl if ttl else None,
+                "bytes": _value_bytes(value),
+                "tables": tables,
+                "value": value,
+            }
+
+            released = _budget_evict(group)
+
+        for table_name in released:
+            release_sync(table_name)
+
+        return copy.deepcopy(value)
+
+    def clear():
+        with _budget_lock:
+            for key in [k for k in _budget_store if k[0] == func_id]:
+                del _budget_store[key]
+
+    loader.clear = clear
+    loader.tables = table_names
+
+    return loader
+
+# =================================
+# TAGGED CACHE DECORATOR
+# =================================
+# @cached_tables("vehicle_units", ttl=60) caches like st.cache_data and
+# keys every entry on the write versions of the declared tables. With no
+# tables declared the first argument is the table name (load_table style);
+# tables_of maps the first argument to its tables instead (per-company
+# loaders), so a write only invalidates that argument's entries.
+# budget="reportes" keeps the entries in the byte-budgeted store instead.
+def cached_tables(
+    *table_names,
+    tables_of=None,
+    ttl=None,
+    max_entries=None,
+    budget=None
+):
+
+    def decorator(func):
+
+        if budget:
+            return _budget_cached(func, table_names, tables_of, ttl, budget)
+
+        def versioned(version, *args, **kwargs):
+            return func(*args, **kwargs)
+
+        # keep the loader's own name and source in the st.cache_data key
+        versioned.__signature__ = inspect.signature(versioned)
+        versioned.__module__ = func.__module__
+        versioned.__name__ = func.__name__
+        versioned.__qualname__ = func.__qualname__
+        versioned.__wrapped__ = func
+
+        cached = st.cache_data(ttl=ttl, max_entries=max_entries)(versioned)
+
+        @functools.wraps(func)
+        def loader(*args, **kwargs):
+
+            tables = _entry_tables(table_names, tables_of, args)
+
+            return cached(table_version(*tables), *args, **kwargs)
+
+        loader.clear = cached.clear
+        loader.tables = table_names
+
+        return loader
+
+    return decorator
@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+# =================================
+# RECORDING CLIENT
+# =================================
+# Real postgrest-py request builders, so the query params under test are
+# the ones the installed client would send; execute() is replaced to
+# record them instead of calling the network.
+@pytest.fixture
+def recording_client(monkeypatch):
+
+    postgrest = pytest.importorskip("postgrest")
+    from postgrest._sync.request_builder import SyncQueryRequestBuilder
+
+    sent = []
+    state = {"count": 0, "rows": []}
+
+    def execute(self):
+
+        sent.append(self.request.params)
+
+        return SimpleNamespace(data=list(state["rows"]), count=state["count"])
+
+    monkeypatch.setattr(SyncQueryRequestBuilder, "execute", execute)
+
+    client = postgrest.SyncPostgrestClient("http://localhost")
+
+    return SimpleNamespace(client=client, sent=sent, state=state)
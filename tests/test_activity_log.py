@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+import activity_log
+
+
+class FakeError(Exception):
+
+    def __init__(self, code=None):
+        super().__init__(code or "connection reset")
+        self.code = code
+
+
+class FakeClient:
+
+    def __init__(self, error_for=lambda rows: None):
+        self.written = []
+        self.error_for = error_for
+
+    def table(self, name):
+        return self
+
+    def insert(self, rows):
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def execute(self):
+
+        error = self.error_for(self.rows)
+
+        if error:
+            raise error
+
+        self.written.extend(self.rows)
+
+        return SimpleNamespace(data=self.rows)
+
+
+def queue(client, rows):
+
+    activity_log._buffer.clear()
+    activity_log._buffer.extend((client, row) for row in rows)
+
+
+def test_permanent_error_drops_only_the_bad_row():
+
+    client = FakeClient(
+        lambda rows: FakeError("23502") if any(r["bad"] for r in rows) else None
+    )
+    rows = [{"n": n, "bad": n == 3} for n in range(10)]
+
+    queue(client, rows)
+
+    assert activity_log.flush_activity() is True
+    assert [r["n"] for r in client.written] == [n for n in range(10) if n != 3]
+    assert not activity_log._buffer
+
+
+def test_transient_error_requeues_the_chunk():
+
+    client = FakeClient(lambda rows: FakeError())
+    rows = [{"n": n} for n in range(5)]
+
+    queue(client, rows)
+
+    assert activity_log.flush_activity() is False
+    assert [row["n"] for _, row in activity_log._buffer] == list(range(5))
+
+    activity_log._buffer.clear()
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+import snapshot_cache
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+
+    if not snapshot_cache.PARQUET_AVAILABLE:
+        pytest.skip("pyarrow not installed")
+
+    monkeypatch.setattr(snapshot_cache, "SNAPSHOT_DIR", str(tmp_path))
+
+    return tmp_path
+
+
+def test_json_columns_round_trip(snapshot_dir):
+
+    key = ("comprobacion_viaje", "*", "created_at")
+
+    df = pd.DataFrame({
+        "id": [1, 2, 3],
+        "folio_comprobacion": ["C1", "C2", None],
+        "conceptos": [
+            [{"Tipo": "Hotel", "Monto": 1200.5, "Aplica IVA": True}],
+            [],
+            None,
+        ],
+        "extra": ["texto", 7, {"a": None}],
+    })
+
+    snapshot_cache.save_snapshot("comprobacion_viaje", key, df, full_sync_at=100)
+
+    loaded, full_sync_at = snapshot_cache.load_snapshot("comprobacion_viaje", key)
+
+    assert full_sync_at == 100
+    assert loaded["conceptos"].tolist() == [
+        [{"Tipo": "Hotel", "Monto": 1200.5, "Aplica IVA": True}],
+        [],
+        None,
+    ]
+    assert isinstance(loaded["conceptos"].iloc[0], list)
+    assert loaded["extra"].tolist() == ["texto", 7, {"a": None}]
+    assert loaded["folio_comprobacion"].tolist()[:2] == ["C1", "C2"]
+    assert loaded["id"].tolist() == [1, 2, 3]
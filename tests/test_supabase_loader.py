@@ -0,0 +1,97 @@
+from supabase_loader import fetch_keyset_page, fetch_rows
+
+
+# =================================
+# KEYSET PAGINATION
+# =================================
+def test_keyset_page_orders_nulls_last(recording_client):
+
+    fetch_keyset_page(
+        recording_client.client,
+        "IGLOO",
+        "Fecha de Captura",
+        "No. de Folio",
+        page_size=11
+    )
+
+    params = recording_client.sent[-1]
+
+    assert params["order"] == '"Fecha de Captura".desc.nullslast,"No. de Folio".desc'
+    assert params["limit"] == "11"
+    assert "or" not in params
+
+
+def test_keyset_page_cursor_condition(recording_client):
+
+    fetch_keyset_page(
+        recording_client.client,
+        "IGLOO",
+        "Fecha de Captura",
+        "No. de Folio",
+        cursor=("2025-01-02", "IG00010")
+    )
+
+    params = recording_client.sent[-1]
+
+    assert params["or"] == (
+        '("Fecha de Captura".lt."2025-01-02",'
+        '"Fecha de Captura".is.null,'
+        'and("Fecha de Captura".eq."2025-01-02","No. de Folio".lt."IG00010"))'
+    )
+    assert params["order"] == '"Fecha de Captura".desc.nullslast,"No. de Folio".desc'
+
+
+def test_keyset_page_null_cursor(recording_client):
+
+    fetch_keyset_page(
+        recording_client.client,
+        "IGLOO",
+        "Fecha de Captura",
+        "No. de Folio",
+        cursor=(None, "IG00010")
+    )
+
+    assert recording_client.sent[-1]["or"] == (
+        '(and("Fecha de Captura".is.null,"No. de Folio".lt."IG00010"))'
+    )
+
+# =================================
+# PARALLEL PAGINATED LOAD
+# =================================
+def test_pages_are_ordered_by_key(recording_client):
+
+    recording_client.state["count"] = 2500
+
+    fetch_rows(recording_client.client, "parts", page_size=1000)
+
+    pages = [p for p in recording_client.sent if "offset" in p]
+
+    assert sorted(int(p["offset"]) for p in pages) == [0, 1000, 2000]
+    assert {p["order"] for p in pages} == {"id.asc"}
+
+
+def test_pages_order_then_key_tiebreak(recording_client):
+
+    recording_client.state["count"] = 1
+
+    fetch_rows(
+        recording_client.client,
+        "solicitud_viaje",
+        order_by="created_at",
+        desc=True,
+        filters=[("gte", "created_at", "2025-01-01")]
+    )
+
+    params = recording_client.sent[-1]
+
+    assert params["order"] == "created_at.desc,id.desc"
+    assert params["created_at"] == "gte.2025-01-01"
+
+
+def test_pages_key_is_not_repeated(recording_client):
+
+    recording_client.state["count"] = 1
+
+    fetch_rows(recording_client.client, "SERVICES", order_by="id")
+
+    assert recording_client.sent[-1]["order"] == "id.asc"
@@ -0,0 +1,98 @@
+import threading
+import time
+from supabase_loader import sync_table
+from table_cache import table_version
+
+# =================================
+# USER DIRECTORY CONFIG
+# =================================
+# In-process copy of profiles indexed by id, full name and email, so
+# write actions stop doing a profile round trip first. New profiles come
+# in through the delta sync; edits from the Usuarios tab go through
+# invalidate_tables("profiles"), which bumps the version checked here.
+PROFILE_COLUMNS = "id, full_name, email"
+DIRECTORY_TTL = 300
+MISS_REFRESH_INTERVAL = 30
+
+_directory = {
+    "version": None,
+    "loaded_at": 0,
+    "miss_at": 0,
+    "by_id": {},
+    "by_name": {},
+    "by_email": {},
+}
+_directory_lock = threading.Lock()
+
+# =================================
+# LOAD
+# =================================
+def _rebuild(supabase):
+
+    df = sync_table(supabase, "profiles", columns=PROFILE_COLUMNS)
+
+    by_id = {}
+    by_name = {}
+    by_email = {}
+
+    for row in df.to_dict(orient="records"):
+
+        by_id[row.get("id")] = row
+
+        if row.get("full_name"):
+            by_name.setdefault(row["full_name"], row)
+
+        if row.get("email"):
+            by_email.setdefault(row["email"].strip().lower(), row)
+
+    _directory.update({
+        "version": table_version("profiles"),
+        "loaded_at": time.monotonic(),
+        "by_id": by_id,
+        "by_name": by_name,
+        "by_email": by_email,
+    })
+
+
+def _lookup(supabase, index, key):
+
+    with _directory_lock:
+
+        stale = (
+            _directory["version"] != table_version("profiles")
+            or time.monotonic() - _directory["loaded_at"] >= DIRECTORY_TTL
+        )
+
+        if stale:
+            _rebuild(supabase)
+
+        row = _directory[index].get(key)
+
+        # unknown key: maybe a profile created since the last sync
+        if (
+            row is None
+            and not stale
+            and time.monotonic() - _directory["miss_at"] >= MISS_REFRESH_INTERVAL
+        ):
+            _directory["miss_at"] = time.monotonic()
+            _rebuild(supabase)
+            row = _directory[index].get(key)
+
+        return row
+
+# =================================
+# LOOKUPS
+# =================================
+def user_by_id(supabase, user_id):
+
+    return _lookup(supabase, "by_id", user_id)
+
+
+def user_by_name(supabase, full_name):
+
+    return _lookup(supabase, "by_name", full_name)
+
+
+def user_by_email(supabase, email):
+
+    return _lookup(supabase, "by_email", (email or "").strip().lower())